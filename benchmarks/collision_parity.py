@@ -0,0 +1,133 @@
+import os
+import random
+import sys
+import tempfile
+from types import SimpleNamespace
+
+# python benchmarks/collision_parity.py [--cases N]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+from config import *
+from collision import CollisionGrid, CollisionSpan, merge_spans
+from levels import parse_tilemap
+from parents import AnimatedSprite
+from tilemaps import generate_tilemap, write_tilemap
+
+
+def tile_grid(level):
+    # one rect per solid tile, row by row, the way the Block sprites were indexed
+    grid = CollisionGrid(TILESIZE)
+    for y in range(level.height):
+        for x in range(level.width):
+            if chr(level.tile(x, y)) in SOLID_TILES:
+                grid.add(CollisionSpan(x * TILESIZE, y * TILESIZE, TILESIZE, TILESIZE))
+    return grid
+
+
+def span_grid(level):
+    # merged runs, split at chunk borders the same way the streamer loads them
+    grid = CollisionGrid(TILESIZE)
+    for top in range(0, level.height, CHUNK_HEIGHT):
+        for left in range(0, level.width, CHUNK_WIDTH):
+            for order, span in merge_spans(level, left, top, left + CHUNK_WIDTH, top + CHUNK_HEIGHT):
+                grid.add(span, order)
+    return grid
+
+
+def resolve(collision, rect, x_change, y_change, direction):
+    actor = SimpleNamespace(game=SimpleNamespace(collision=collision), rect=pygame.Rect(rect),
+                            x_change=x_change, y_change=y_change, move_state=MOVE_STOP, grounded=False)
+    AnimatedSprite.collision_detect(actor, direction)
+    return tuple(actor.rect), actor.x_change, actor.y_change, actor.move_state, actor.grounded
+
+
+def check(cases, seed=0):
+    # actors dropped anywhere in the level, most of them partly inside solid
+    # tiles, must end up where the per-tile blocks would put them
+    rng = random.Random(seed)
+    level = parse_tilemap(generate_tilemap(256, 0.0, seed))
+    tiles = tile_grid(level)
+    spans = span_grid(level)
+    failures = []
+    for case in range(cases):
+        size = rng.choice(((PLAYER_WIDTH, PLAYER_HEIGHT), (ENEMY_WIDTH, ENEMY_HEIGHT)))
+        rect = (rng.randrange(-TILESIZE, level.width * TILESIZE), rng.randrange(0, level.height * TILESIZE)) + size
+        x_change = rng.choice((-5, -1, 1, 5))
+        y_change = rng.choice((-7.0, 0.4, 3.5))
+        for direction in ('x', 'y'):
+            expected = resolve(tiles, rect, x_change, y_change, direction)
+            actual = resolve(spans, rect, x_change, y_change, direction)
+            if expected != actual:
+                failures.append((rect, x_change, y_change, direction, expected, actual))
+    return failures
+
+
+def trajectory(directory, frames, enemy_batch, seed=0):
+    # player and enemy rects every tick on the levels in directory, with the
+    # enemies first scattered over the screen so some start inside tiles
+    import main
+    from inputs import ScriptedInput
+    from levels import LevelCatalogue
+
+    main.ENEMY_BATCH = enemy_batch
+    game = main.Game(headless=True, input_source=ScriptedInput())
+    game.levels = LevelCatalogue(directory)
+    game.new()
+    # clear of the player, a death would reset the level and respawn them
+    rng = random.Random(seed)
+    for enemy in game.enemy.sprites():
+        state = list(enemy.get_state())
+        state[0] = rng.randrange(6 * TILESIZE, WIN_WIDTH)
+        state[1] = rng.randrange(0, WIN_HEIGHT - TILESIZE)
+        state[-1] = True
+        enemy.set_state(tuple(state))
+
+    states = []
+    for frame in range(frames):
+        if not game.playing:
+            break
+        game.input.set_keys({pygame.K_RIGHT, pygame.K_UP} if frame % 40 < 6 else {pygame.K_RIGHT})
+        game.update()
+        states.append((tuple(game.player.sprites()[0].rect), sorted(tuple(enemy.rect) for enemy in game.enemy)))
+    return states
+
+
+def check_batch(frames, seed=0):
+    # the NumPy enemy batch has to move every enemy the way Enemy.update does,
+    # the first tick they differ or None
+    with tempfile.TemporaryDirectory() as directory:
+        write_tilemap(os.path.join(directory, 'level1.txt'), 1024, 0.1, seed)
+        expected = trajectory(directory, frames, False, seed)
+        actual = trajectory(directory, frames, True, seed)
+    for tick, (a, b) in enumerate(zip(expected, actual)):
+        if a != b:
+            return tick
+    if len(expected) != len(actual):
+        return min(len(expected), len(actual))
+    return None
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Check merged collision spans resolve like single tiles.')
+    parser.add_argument('--cases', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--enemy-batch', type=int, metavar='FRAMES',
+                        help='also play this many frames with and without the NumPy enemy batch')
+    args = parser.parse_args()
+
+    failures = check(args.cases, args.seed)
+    for rect, x_change, y_change, direction, expected, actual in failures[:10]:
+        print(f"{rect} moving ({x_change}, {y_change}) on {direction}: tiles {expected}, spans {actual}")
+    print(f"{args.cases} actors, {len(failures)} resolved differently")
+
+    tick = None
+    if args.enemy_batch:
+        tick = check_batch(args.enemy_batch, args.seed)
+        print('enemy batch matches' if tick is None else f"enemy batch differs at tick {tick}")
+    sys.exit(1 if failures or tick is not None else 0)
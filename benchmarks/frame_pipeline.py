@@ -0,0 +1,260 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+
+# python benchmarks/frame_pipeline.py [--frames N] [--baseline old.json]
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+import main
+from inputs import ScriptedInput
+from levels import LevelCatalogue
+from tilemaps import write_tilemap
+
+PHASES = ('createTilemap', 'update', 'collision', 'streaming', 'draw', 'hud', 'display')
+WIDTHS = (256, 1024, 4096)
+DENSITIES = (0.0, 0.02, 0.1)
+
+# phases faster than this per frame are left out of the regression check
+NOISE_MS = 0.05
+
+
+class PhaseClock:
+    # exclusive time per phase, a phase called inside another pauses the outer one
+    def __init__(self, allocations=False):
+        self.allocations = allocations
+        self.times = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.peak = defaultdict(int)
+        self.net = defaultdict(int)
+        self.stack = []
+        self.mark = time.perf_counter()
+        self.memory = 0
+
+    def switch(self):
+        # charge everything since the last switch to the innermost phase
+        if self.stack:
+            phase = self.stack[-1]
+            self.times[phase] += time.perf_counter() - self.mark
+            if self.allocations:
+                current, peak = tracemalloc.get_traced_memory()
+                self.peak[phase] = max(self.peak[phase], peak - self.memory)
+                self.net[phase] += current - self.memory
+        if self.allocations:
+            tracemalloc.reset_peak()
+            self.memory = tracemalloc.get_traced_memory()[0]
+        self.mark = time.perf_counter()
+
+    def wrap(self, obj, name, phase):
+        method = getattr(obj, name)
+
+        def timed(*args, **kwargs):
+            self.calls[phase] += 1
+            self.switch()
+            self.stack.append(phase)
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.switch()
+                self.stack.pop()
+
+        setattr(obj, name, timed)
+
+
+def instrument(game, clock):
+    # update and display are what is left of Game.update and Game.draw
+    # once the phases they call are taken out
+    clock.wrap(game, 'update', 'update')
+    clock.wrap(game, 'draw', 'display')
+    clock.wrap(game.renderer, 'draw', 'draw')
+    for widget in (game.timer, game.score, game.lives):
+        clock.wrap(widget, 'draw', 'hud')
+
+    # the collision grid and streamer are rebuilt with every level
+    create = game.createTilemap
+
+    def createTilemap(level):
+        create(level)
+        clock.wrap(game.collision, 'collide', 'collision')
+        clock.wrap(game.world, 'update', 'streaming')
+
+    game.createTilemap = createTilemap
+    clock.wrap(game, 'createTilemap', 'createTilemap')
+
+
+def bot_keys(frame):
+    # run right, jumping for a few frames out of every forty
+    if frame % 40 < 6:
+        return {pygame.K_RIGHT, pygame.K_UP}
+    return {pygame.K_RIGHT}
+
+
+def run_case(directory, frames, allocations=False):
+    game = main.Game(headless=True, input_source=ScriptedInput())
+    game.levels = LevelCatalogue(directory)
+    clock = PhaseClock(allocations)
+    instrument(game, clock)
+
+    if allocations:
+        tracemalloc.start()
+    start = time.perf_counter()
+    restarts = 0
+    max_x = 0
+    max_scroll = 0
+    game.new()
+    for frame in range(frames):
+        if not game.playing:
+            game.new()
+            restarts += 1
+        game.input.set_keys(bot_keys(frame))
+        game.events()
+        game.update()
+        game.draw()
+        # how far the run got, a bot that never leaves the first screen measures nothing
+        max_x = max(max_x, game.player.sprites()[0].rect.x)
+        max_scroll = max(max_scroll, -game.camera.camera.x)
+    seconds = time.perf_counter() - start
+    if allocations:
+        tracemalloc.stop()
+
+    return clock, seconds, restarts, max_x, max_scroll
+
+
+def run(widths, densities, frames, seed=0, allocations=True):
+    cases = []
+    with tempfile.TemporaryDirectory() as directory:
+        for width in widths:
+            for density in densities:
+                name = f"w{width}-e{density:g}"
+                case_dir = os.path.join(directory, name)
+                os.mkdir(case_dir)
+                level_path = write_tilemap(os.path.join(case_dir, 'level1.txt'), width, density, seed)
+                with open(level_path) as file:
+                    enemies = file.read().count('E')
+
+                clock, seconds, restarts, max_x, max_scroll = run_case(case_dir, frames)
+                phases = {}
+                for phase in PHASES:
+                    calls = clock.calls[phase]
+                    total = clock.times[phase] * 1000
+                    phases[phase] = {
+                        'calls': calls,
+                        'total_ms': round(total, 3),
+                        # createTilemap is measured per level build, the rest per frame
+                        'ms': round(total / max(1, calls if phase == 'createTilemap' else frames), 4),
+                    }
+
+                if allocations:
+                    memory = run_case(case_dir, frames, allocations=True)[0]
+                    for phase in PHASES:
+                        phases[phase]['alloc_peak_kb'] = round(memory.peak[phase] / 1024, 1)
+                        phases[phase]['alloc_net_kb'] = round(memory.net[phase] / 1024, 1)
+
+                cases.append({
+                    'name': name,
+                    'width': width,
+                    'enemy_density': density,
+                    'enemies': enemies,
+                    'frames': frames,
+                    'seconds': round(seconds, 3),
+                    'fps': round(frames / seconds, 1),
+                    'restarts': restarts,
+                    'max_player_x': max_x,
+                    'max_scroll': max_scroll,
+                    # the camera has to scroll for streaming, culling and baking to be timed
+                    'failed': max_scroll == 0,
+                    'phases': phases,
+                })
+                print(format_case(cases[-1]), flush=True)
+    return cases
+
+
+def revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_case(case):
+    timings = '  '.join(f"{phase} {case['phases'][phase]['ms']:.3f}" for phase in PHASES)
+    line = (f"{case['name']:<14} {case['enemies']:>6} enemies  {case['fps']:>8.1f} fps  "
+            f"scroll {case['max_scroll']:>6}  ms: {timings}")
+    if case['failed']:
+        line += '  FAILED: the camera never moved'
+    return line
+
+
+def compare(baseline, results, threshold):
+    # phases that got slower than baseline by more than threshold
+    regressions = []
+    previous = {case['name']: case for case in baseline['cases']}
+    for case in results['cases']:
+        old = previous.get(case['name'])
+        if old is None:
+            continue
+        for phase in PHASES:
+            before = old['phases'][phase]['ms']
+            after = case['phases'][phase]['ms']
+            if before < NOISE_MS and after < NOISE_MS:
+                continue
+            ratio = after / before if before else float('inf')
+            print(f"{case['name']:<14} {phase:<14} {before:>9.3f} -> {after:>9.3f} ms  x{ratio:.2f}")
+            if ratio > 1 + threshold:
+                regressions.append((case['name'], phase, ratio))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time the game loop headless on synthetic levels.')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--widths', type=int, nargs='+', default=WIDTHS)
+    parser.add_argument('--densities', type=float, nargs='+', default=DENSITIES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-allocations', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--enemy-batch', action='store_true', help='update enemies with the NumPy batch')
+    parser.add_argument('--output', help='results file, benchmarks/results/<revision>.json by default')
+    parser.add_argument('--baseline', help='results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='slowdown that counts as a regression, 0.15 is 15%%')
+    args = parser.parse_args()
+
+    main.ENEMY_BATCH = args.enemy_batch
+    results = {
+        'revision': revision(),
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'enemy_batch': args.enemy_batch,
+        'frames': args.frames,
+        'cases': run(args.widths, args.densities, args.frames, args.seed, not args.no_allocations),
+    }
+
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f"{results['revision'] or 'local'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(output)
+
+    failed = [case['name'] for case in results['cases'] if case['failed']]
+    for name in failed:
+        print(f"failed: {name} never scrolled the camera")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(json.load(file), results, args.threshold)
+        for name, phase, ratio in regressions:
+            print(f"regression: {name} {phase} x{ratio:.2f}")
+    sys.exit(1 if failed or regressions else 0)
@@ -0,0 +1,52 @@
+import random
+import sys
+
+# synthetic levels in the tilemap .txt format, one screen tall like the real ones
+HEIGHT = 24
+GROUND = 'G'
+BRICK = 'B'
+FLAG = 'F'
+
+
+def generate_tilemap(width, enemy_density, seed=0):
+    # ground with gaps, floating platforms, walls to turn the enemies around,
+    # and enemy_density of the free cells above the ground filled with enemies
+    rng = random.Random(seed)
+    rows = [['.'] * width for _ in range(HEIGHT)]
+
+    for x in range(width):
+        if x < 16 or x > width - 8 or rng.random() > 0.04:
+            rows[HEIGHT - 1][x] = GROUND
+            rows[HEIGHT - 2][x] = GROUND
+
+    for _ in range(width // 12):
+        x = rng.randrange(16, max(17, width - 12))
+        y = rng.randrange(6, HEIGHT - 6)
+        for i in range(rng.randrange(3, 10)):
+            rows[y][min(x + i, width - 1)] = BRICK
+
+    for _ in range(width // 24):
+        x = rng.randrange(16, max(17, width - 12))
+        for i in range(rng.randrange(1, 3)):
+            rows[HEIGHT - 3 - i][x] = BRICK
+
+    for y in range(HEIGHT - 2):
+        for x in range(16, width - 8):
+            if rows[y][x] == '.' and rng.random() < enemy_density:
+                rows[y][x] = 'E'
+
+    # the player is two tiles tall, so it spawns with two clear rows above the ground
+    rows[HEIGHT - 4][2] = 'P'
+    rows[HEIGHT - 3][width - 3] = FLAG
+    return [''.join(row) for row in rows]
+
+
+def write_tilemap(file_path, width, enemy_density, seed=0):
+    with open(file_path, 'w') as file:
+        file.write('\n'.join(generate_tilemap(width, enemy_density, seed)) + '\n')
+    return file_path
+
+
+if __name__ == '__main__':
+    # python benchmarks/tilemaps.py out.txt width enemy_density
+    print(write_tilemap(sys.argv[1], int(sys.argv[2]), float(sys.argv[3])))
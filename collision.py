@@ -0,0 +1,95 @@
+import re
+import pygame
+from config import *
+
+class CollisionGrid:
+    def __init__(self, cell_size=TILESIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.order = {}
+        self.queries = 0
+
+    def _cell_range(self, rect):
+        size = self.cell_size
+        return (rect.left // size, (rect.right - 1) // size,
+                rect.top // size, (rect.bottom - 1) // size)
+
+    def add(self, item, order=None):
+        # hits come back sorted by order, insertion order unless given
+        self.order[item] = len(self.order) if order is None else order
+        left, right, top, bottom = self._cell_range(item.rect)
+        for cy in range(top, bottom + 1):
+            for cx in range(left, right + 1):
+                self.cells.setdefault((cx, cy), []).append(item)
+
+    def remove(self, item):
+        if self.order.pop(item, None) is None:
+            return
+        left, right, top, bottom = self._cell_range(item.rect)
+        for cy in range(top, bottom + 1):
+            for cx in range(left, right + 1):
+                cell = self.cells.get((cx, cy))
+                if cell is not None:
+                    cell.remove(item)
+                    if not cell:
+                        del self.cells[(cx, cy)]
+
+    def clear(self):
+        self.cells.clear()
+        self.order.clear()
+
+    def collide(self, rect):
+        # same result as spritecollide over the indexed group
+        self.queries += 1
+        cells = self.cells
+        left, right, top, bottom = self._cell_range(rect)
+        hits = []
+        for cy in range(top, bottom + 1):
+            for cx in range(left, right + 1):
+                cell = cells.get((cx, cy))
+                if cell is None:
+                    continue
+                for item in cell:
+                    if item not in hits and rect.colliderect(item.rect):
+                        hits.append(item)
+        if len(hits) > 1:
+            hits.sort(key=self.order.__getitem__)
+        return hits
+
+
+class CollisionSpan:
+    # a run of solid tiles that collides as one rect
+    __slots__ = ('rect',)
+
+    def __init__(self, x, y, width, height):
+        self.rect = pygame.Rect(x, y, width, height)
+
+
+SOLID_RUN = re.compile(b'[' + re.escape(SOLID_TILES.encode('ascii')) + b']+')
+
+
+def merge_spans(level, left, top, right, bottom, rectangles=False):
+    # (order, span) pairs for the solid tiles with left <= x < right and top <= y < bottom
+    grid = level.grid
+    width = level.width
+    left = max(0, left)
+    right = min(width, right)
+
+    spans = []
+    open_runs = {}
+    for y in range(max(0, top), min(level.height, bottom)):
+        start = y * width
+        runs = {}
+        for match in SOLID_RUN.finditer(grid, start + left, start + right):
+            run = (match.start() - start, match.end() - start)
+            previous = open_runs.get(run)
+            if rectangles and previous is not None:
+                # same run as the row above, grow that rect down
+                previous[1].rect.height += TILESIZE
+                runs[run] = previous
+                continue
+            span = CollisionSpan(run[0] * TILESIZE, y * TILESIZE, (run[1] - run[0]) * TILESIZE, TILESIZE)
+            runs[run] = ((y, run[0]), span)
+            spans.append(runs[run])
+        open_runs = runs
+    return spans
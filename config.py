@@ -5,6 +5,10 @@ WIN_WIDTH = 640
 WIN_HEIGHT = 480
 TILESIZE = 20
 FPS = 30
+# physics steps per second, the movement constants are tuned per step
+TICK_RATE = 30
+# longest frame time caught up on, slower frames drop game time
+MAX_FRAME_TIME = 0.25
 SCROLL = (0, 0)
 
 ASSETS_DIR = "assets"
@@ -13,6 +17,8 @@ IMG_DIR = f"{ASSETS_DIR}/img"
 SPRITES_DIR = IMG_DIR
 SOUNDS_DIR = f"{ASSETS_DIR}/sounds"
 FONT_DIR = ASSETS_DIR
+# levels are played in name order from LEVEL_DIR, compiled from the
+# .txt tilemaps with: python levels.py assets/levels/*.txt
 LEVEL_DIR = f"{ASSETS_DIR}/levels"
 
 IMG_INTRO = f"{IMG_DIR}/DinioIntro.png"
@@ -23,6 +29,20 @@ SPRITE_FLAG = f"{SPRITES_DIR}/GameWinFlag.png"
 SPRITE_BRICK_1 = f"{SPRITES_DIR}/Brick 1.png"
 SPRITE_BRICK_2 = f"{SPRITES_DIR}/Brick 2.png"
 
+# static tiles baked into the level's chunk surfaces
+TILE_SPRITES = {
+    'B': SPRITE_BRICK_1,
+    'G': SPRITE_BRICK_2,
+    'F': SPRITE_FLAG,
+}
+
+# tiles the actors collide with, merged into runs for physics. Merging
+# runs into rectangles as well gives fewer rects, but an actor pushed
+# into the side of one snaps to its top row instead of the row it hit
+SOLID_TILES = 'BG'
+FLAG_TILE = 'F'
+MERGE_RECTANGLES = False
+
 MUSIC_MAIN = f"{SOUNDS_DIR}/sky-loop.wav"
 SOUND_WIN = f"{SOUNDS_DIR}/level-win.wav"
 SOUND_GAME_OVER = f"{SOUNDS_DIR}/game-over.wav"
@@ -38,15 +58,61 @@ VOL_BOUNCE = 0.3
 
 MAIN_FONT = f"{FONT_DIR}/Cantarell.ttf"
 FONT_SIZE = 32
+# rendered text surfaces kept for the HUD
+TEXT_CACHE_SIZE = 64
+# font objects kept open, keyed by path and size
+FONT_POOL_SIZE = 16
 
-TILEMAP_1 = f"{LEVEL_DIR}/tilemap1.txt"
-TILEMAP_2 = f"{LEVEL_DIR}/tilemap2.txt"
+# scaled menu backgrounds kept, and window sizes scaled for at startup
+SCALED_CACHE_SIZE = 12
+PRESCALE_WINDOW_SIZES = [(1280, 720), (1280, 960), (1920, 1080)]
 
 PLAYER_WIDTH = 32
 PLAYER_HEIGHT = 32
 
 PLAYER_LAYER = 3
-BLOCK_LAYER = 1
+
+# chunk size in tiles for the pre-rendered tile layer
+CHUNK_WIDTH = 32
+CHUNK_HEIGHT = 24
+# chunks around the view that are streamed in, and the distance at
+# which they are retired again
+LOAD_RADIUS = 1
+RETIRE_RADIUS = 2
+
+# step all enemies together with NumPy when it is installed, the result
+# is the same as updating them one by one
+ENEMY_BATCH = False
+
+# extra pixels around the view that still count as visible
+CULL_MARGIN = TILESIZE * 2
+
+# profiler overlay, toggled with F3. Each profiled frame is written to
+# PROFILE_LOG, .csv for a spreadsheet or .jsonl, and the log is rotated
+# to PROFILE_LOG + '.1' after PROFILE_LOG_LINES frames
+PROFILE_LOG = "profile.jsonl"
+PROFILE_LOG_LINES = 10000
+# frames averaged on the overlay, and frames between overlay refreshes
+PROFILE_HISTORY = 30
+PROFILE_REFRESH = 15
+PROFILE_FONT_SIZE = 12
+PROFILE_COLOR = (60, 60, 60)
+
+# training environment, the observation is the tiles in a window this many
+# tiles across and down centred on the player, and each step holds the
+# chosen keys for ENV_FRAME_SKIP updates
+ENV_VIEW_WIDTH = 16
+ENV_VIEW_HEIGHT = 12
+ENV_FRAME_SKIP = 1
+
+# 'surface' scales each finished frame, 'direct' pre-scales the art and
+# draws at window resolution, INTEGER_SCALE snaps it to whole multiples
+RENDERER = 'surface'
+INTEGER_SCALE = False
+
+# push only the parts of the window that changed while the camera holds
+# still and on the menus, the whole window whenever it scrolls
+DIRTY_RECTS = True
 
 PLAYER_SPEED = 1
 PLAYER_MAX_SPEED = 5
@@ -64,6 +130,11 @@ PLAYER_DEATH = 0 # temporary. need to make a new animation
 
 PLAYER_ANIMATION_SPEED = 250
 
+# Directions, also the enemies' walking speed
+MOVE_LEFT = -1
+MOVE_STOP = 0
+MOVE_RIGHT = 1
+
 ENEMY_WALK = 0
 ENEMY_SMUSH = 1
 
@@ -100,12 +171,3 @@ def resource_path(relative_path):
     except AttributeError:
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
-
-def load_tilemap(file_path):
-    with open(file_path, 'r') as file:
-        tilemap = [line.strip() for line in file.readlines()]
-    return tilemap
-
-LEVEL_1 = load_tilemap(resource_path(TILEMAP_1))
-LEVEL_2 = load_tilemap(resource_path(TILEMAP_2))
-LEVELS = [LEVEL_1, LEVEL_2]
@@ -0,0 +1,274 @@
+import numpy as np
+from config import *
+
+class EnemyBatch:
+    # steps every enemy at once with the same rules as Enemy.update, the
+    # arrays hold the state and the sprites are brought up to date from them
+    def __init__(self, game, level, capacity=256):
+        self.game = game
+
+        grid = np.frombuffer(level.grid, dtype=np.uint8).reshape(level.height, level.width)
+        self.solid = np.isin(grid, np.frombuffer(SOLID_TILES.encode('ascii'), dtype=np.uint8))
+        self.loaded = np.zeros((-(-level.height // CHUNK_HEIGHT), -(-level.width // CHUNK_WIDTH)), dtype=bool)
+
+        self.sprites = []
+        self.index = {}
+        self.synced = set()
+        self.frame_counts = None
+
+        self.x = np.zeros(capacity, dtype=np.int64)
+        self.y = np.zeros(capacity, dtype=np.int64)
+        self.width = np.zeros(capacity, dtype=np.int64)
+        self.height = np.zeros(capacity, dtype=np.int64)
+        self.x_change = np.zeros(capacity, dtype=np.int64)
+        self.y_change = np.zeros(capacity, dtype=np.float64)
+        self.move_state = np.zeros(capacity, dtype=np.int64)
+        self.action_state = np.zeros(capacity, dtype=np.int64)
+        self.frame = np.zeros(capacity, dtype=np.int64)
+        self.last_update = np.zeros(capacity, dtype=np.float64)
+        self.animation_rate = np.zeros(capacity, dtype=np.int64)
+        self.grounded = np.zeros(capacity, dtype=bool)
+        self.awake = np.zeros(capacity, dtype=bool)
+
+    fields = ('x', 'y', 'width', 'height', 'x_change', 'y_change', 'move_state', 'action_state',
+              'frame', 'last_update', 'animation_rate', 'grounded', 'awake')
+
+    def __len__(self):
+        return len(self.sprites)
+
+    def add(self, sprite):
+        i = len(self.sprites)
+        if i == len(self.x):
+            for name in self.fields:
+                array = getattr(self, name)
+                setattr(self, name, np.concatenate([array, np.zeros_like(array)]))
+        if self.frame_counts is None:
+            self.frame_counts = np.array([len(frames) for frames in sprite.animation_list])
+
+        self.sprites.append(sprite)
+        self.index[sprite] = i
+        self.pull(sprite)
+
+    def remove(self, sprite):
+        # the last enemy takes the freed slot
+        i = self.index.pop(sprite, None)
+        if i is None:
+            return
+        last = len(self.sprites) - 1
+        moved = self.sprites.pop()
+        if i != last:
+            self.sprites[i] = moved
+            self.index[moved] = i
+            for name in self.fields:
+                array = getattr(self, name)
+                array[i] = array[last]
+
+    def pull(self, sprite):
+        # read a sprite's state into the arrays after it was changed directly
+        i = self.index.get(sprite)
+        if i is None:
+            return
+        rect = sprite.rect
+        self.x[i] = rect.x
+        self.y[i] = rect.y
+        self.width[i] = rect.width
+        self.height[i] = rect.height
+        self.x_change[i] = sprite.x_change
+        self.y_change[i] = sprite.y_change
+        self.move_state[i] = sprite.move_state
+        self.action_state[i] = sprite.action_state
+        self.frame[i] = sprite.frame
+        self.last_update[i] = sprite.last_update
+        self.animation_rate[i] = sprite.animation_rate
+        self.grounded[i] = sprite.grounded
+        self.awake[i] = sprite.wasOnScreen
+
+    def push(self, indices, previous=None):
+        # write the full state back to the sprites at indices
+        sprites = self.sprites
+        if previous is None:
+            previous = zip(self.x[indices].tolist(), self.y[indices].tolist())
+        rows = zip(indices.tolist(), previous, self.x[indices].tolist(), self.y[indices].tolist(),
+                   self.x_change[indices].tolist(), self.y_change[indices].tolist(),
+                   self.move_state[indices].tolist(), self.action_state[indices].tolist(),
+                   self.frame[indices].tolist(), self.last_update[indices].tolist(),
+                   self.animation_rate[indices].tolist(), self.grounded[indices].tolist(),
+                   self.awake[indices].tolist())
+        for (i, previous, x, y, x_change, y_change, move_state, action_state, frame,
+             last_update, animation_rate, grounded, awake) in rows:
+            sprite = sprites[i]
+            sprite.previous = previous
+            sprite.rect.topleft = (x, y)
+            sprite.x_change = x_change
+            sprite.y_change = y_change
+            sprite.move_state = move_state
+            sprite.action_state = action_state
+            sprite.frame = frame
+            sprite.last_update = last_update
+            sprite.animation_rate = animation_rate
+            sprite.grounded = grounded
+            sprite.wasOnScreen = awake
+            sprite.image = sprite.animation_list[action_state][frame]
+
+    def sync(self, sprite):
+        # sprites pushed this tick are current, the player may have changed them since
+        i = self.index.get(sprite)
+        if i is not None and sprite not in self.synced:
+            self.push(np.array([i]))
+
+    def strays(self, streamer):
+        # awake enemies touching a chunk that is not loaded, the streamer decides
+        count = len(self.sprites)
+        self.set_loaded(streamer.loaded)
+        awake = np.flatnonzero(self.awake[:count])
+        x = self.x[awake]
+        y = self.y[awake]
+        first_x = np.maximum(0, x // streamer.chunk_width)
+        last_x = np.minimum(streamer.columns - 1, (x + self.width[awake] - 1) // streamer.chunk_width)
+        first_y = np.maximum(0, y // streamer.chunk_height)
+        last_y = np.minimum(streamer.rows - 1, (y + self.height[awake] - 1) // streamer.chunk_height)
+
+        # an enemy is smaller than a chunk, so its corners cover every chunk it touches
+        outside = (first_x > last_x) | (first_y > last_y)
+        first_x = np.minimum(first_x, streamer.columns - 1)
+        first_y = np.minimum(first_y, streamer.rows - 1)
+        last_x = np.maximum(last_x, 0)
+        last_y = np.maximum(last_y, 0)
+        loaded = self.loaded
+        stray = outside | ~(loaded[first_y, first_x] & loaded[first_y, last_x] &
+                            loaded[last_y, first_x] & loaded[last_y, last_x])
+        return [self.sprites[i] for i in awake[stray].tolist()]
+
+    def set_loaded(self, chunks):
+        self.loaded[:] = False
+        for cx, cy in chunks:
+            self.loaded[cy, cx] = True
+
+    def collide(self, x, y, width, height):
+        # first tile hit by each rect, the tile collision_detect resolves against
+        solid = self.solid
+        rows, columns = solid.shape
+        hit = np.zeros(len(x), dtype=bool)
+        hit_row = np.zeros(len(x), dtype=np.int64)
+        hit_column = np.zeros(len(x), dtype=np.int64)
+
+        first_row = y // TILESIZE
+        last_row = (y + height - 1) // TILESIZE
+        first_column = x // TILESIZE
+        last_column = (x + width - 1) // TILESIZE
+        for dy in range(int((last_row - first_row).max(initial=0)) + 1):
+            row = first_row + dy
+            for dx in range(int((last_column - first_column).max(initial=0)) + 1):
+                column = first_column + dx
+                inside = (~hit & (row <= last_row) & (column <= last_column) &
+                          (row >= 0) & (row < rows) & (column >= 0) & (column < columns))
+                r = np.where(inside, row, 0)
+                c = np.where(inside, column, 0)
+                # only the spans of loaded chunks are in the collision grid
+                found = inside & solid[r, c] & self.loaded[r // CHUNK_HEIGHT, c // CHUNK_WIDTH]
+                hit_row[found] = r[found]
+                hit_column[found] = c[found]
+                hit |= found
+        return hit, hit_row, hit_column
+
+    def update(self):
+        game = self.game
+        count = len(self.sprites)
+
+        # the player may have stomped the enemies it could reach last tick
+        for sprite in self.synced:
+            self.pull(sprite)
+        self.synced.clear()
+        if not count:
+            return
+
+        self.set_loaded(game.world.loaded)
+
+        before_x = self.x[:count].copy()
+        before_y = self.y[:count].copy()
+        x = before_x
+        y = before_y
+        width = self.width[:count]
+        height = self.height[:count]
+
+        world_rect = game.camera.world_rect
+        on_screen = ((x < world_rect.right) & (x + width > world_rect.left) &
+                     (y < world_rect.bottom) & (y + height > world_rect.top))
+        woken = np.flatnonzero(on_screen & ~self.awake[:count])
+        self.awake[:count] |= on_screen
+        active = np.flatnonzero(self.awake[:count])
+
+        x = x[active]
+        y = y[active]
+        width = width[active]
+        height = height[active]
+        move_state = self.move_state[active]
+        action_state = self.action_state[active]
+        frame = self.frame[active]
+        last_update = self.last_update[active]
+        y_change = self.y_change[active]
+
+        # movement, the direction is the walking speed
+        x_change = move_state.copy()
+
+        # animation
+        ticks = game.ticks
+        due = ticks - last_update >= self.animation_rate[active]
+        frame = np.where(due, frame + 1, frame)
+        last_update = np.where(due, ticks, last_update)
+        frame[frame >= self.frame_counts[action_state]] = 0
+        finished = active[(action_state == ENEMY_SMUSH) & (frame == self.frame_counts[ENEMY_SMUSH] - 1)]
+
+        # horizontal move and collision, against the edges of the first tile hit
+        # the same way collision_detect clamps a span to the tile it overlaps
+        x = x + x_change
+        hit, row, column = self.collide(x, y, width, height)
+        right_hit = hit & (x_change > 0)
+        left_hit = hit & (x_change < 0)
+        x = np.where(right_hit, column * TILESIZE - width, x)
+        x = np.where(left_hit, (column + 1) * TILESIZE, x)
+        move_state = np.where(right_hit, MOVE_LEFT, np.where(left_hit, MOVE_RIGHT, move_state))
+        x_change[hit] = 0
+
+        # vertical move, rect assignment rounds halves away from zero
+        moved = y + y_change
+        whole = np.trunc(moved)
+        fraction = moved - whole
+        y = (whole + np.sign(fraction) * (np.abs(fraction) >= 0.5)).astype(np.int64)
+        hit, row, _ = self.collide(x, y, width, height)
+        y = np.where(hit & (y_change > 0), row * TILESIZE - height, y)
+        y = np.where(hit & (y_change < 0), (row + 1) * TILESIZE, y)
+        y_change[hit] = 0
+
+        # falling check, then gravity
+        grounded = self.collide(x, y + 1, width, height)[0]
+        y_change = np.where(grounded, 0.0, y_change + self.game.physics.gravity)
+
+        self.x[active] = x
+        self.y[active] = y
+        self.x_change[active] = x_change
+        self.y_change[active] = y_change
+        self.move_state[active] = move_state
+        self.frame[active] = frame
+        self.last_update[active] = last_update
+        self.grounded[active] = grounded
+
+        # rects stay current for culling, streaming and the player's enemy check
+        sprites = self.sprites
+        changed = np.flatnonzero((self.x[:count] != before_x) | (self.y[:count] != before_y))
+        for i, position in zip(changed.tolist(),
+                               zip(self.x[changed].tolist(), self.y[changed].tolist())):
+            sprites[i].rect.topleft = position
+        for i in woken.tolist():
+            sprites[i].wasOnScreen = True
+
+        # everything else only for the enemies the player can reach or see
+        camera = game.camera
+        band = camera.view_rect.union(world_rect).inflate(camera.margin * 2, 0)
+        near = np.flatnonzero((self.x[:count] < band.right) & (self.x[:count] + self.width[:count] > band.left))
+        self.push(near, zip(before_x[near].tolist(), before_y[near].tolist()))
+        self.synced.update(sprites[i] for i in near.tolist())
+
+        # remove enemies once the death animation completes
+        for sprite in [sprites[i] for i in finished.tolist()]:
+            sprite.kill()
@@ -0,0 +1,202 @@
+import time
+import numpy as np
+import pygame
+from config import *
+from inputs import KeyState, ScriptedInput
+from physics import PhysicsParams
+
+# what each cell of the observed tile window holds
+OBS_EMPTY = 0
+OBS_SOLID = 1
+OBS_FLAG = 2
+OBS_ENEMY = 3
+
+# an action is an index into the keys held for it
+ACTIONS = (
+    (),
+    (pygame.K_LEFT,),
+    (pygame.K_RIGHT,),
+    (pygame.K_UP,),
+    (pygame.K_LEFT, pygame.K_UP),
+    (pygame.K_RIGHT, pygame.K_UP),
+)
+ACTION_KEYS = tuple(KeyState(keys) for keys in ACTIONS)
+
+
+def tile_classes(level, view_width, view_height):
+    # the level grid as observation classes, padded by half a window on
+    # every side so a window around any tile can be sliced straight out
+    classes = np.zeros(256, dtype=np.uint8)
+    classes[np.frombuffer(SOLID_TILES.encode('ascii'), dtype=np.uint8)] = OBS_SOLID
+    classes[ord(FLAG_TILE)] = OBS_FLAG
+
+    # index a copy, a view on a memory-mapped grid would stop the level closing
+    grid = np.array(level.grid, dtype=np.uint8).reshape(level.height, level.width)
+    return np.pad(classes[grid], ((view_height // 2, view_height - view_height // 2),
+                                  (view_width // 2, view_width - view_width // 2)))
+
+
+class DinioEnv:
+    # reset() and step(action) around a headless game. An episode is one life,
+    # it ends when the player dies, finishes the level or runs out of steps.
+    # The reward is the change in score, so a death costs the score it resets
+    def __init__(self, level=0, frame_skip=ENV_FRAME_SKIP, max_steps=None, physics=None,
+                 view_width=ENV_VIEW_WIDTH, view_height=ENV_VIEW_HEIGHT):
+        import main
+
+        self.game = main.Game(headless=True, input_source=ScriptedInput())
+        if physics is not None:
+            self.game.physics = PhysicsParams(**physics)
+
+        self.start_level = level
+        self.frame_skip = frame_skip
+        self.max_steps = max_steps
+        self.view_width = view_width
+        self.view_height = view_height
+        self.action_count = len(ACTIONS)
+
+        self.classes = None
+        self.classes_level = None
+        self.steps = 0
+        self.level_index = 0
+        self.lives = 0
+        self.score = 0
+
+    def reset(self, level=None):
+        game = self.game
+        game.ticks = 0
+        game.new()
+        level = self.start_level if level is None else level
+        if level:
+            game.level_index = level
+            game.reset_level()
+
+        self.steps = 0
+        self.level_index = game.level_index
+        self.lives = game.lives.lives
+        self.score = game.score.score_val
+        return self.observe()
+
+    def step(self, action):
+        game = self.game
+        game.input.keys = ACTION_KEYS[action]
+        for _ in range(self.frame_skip):
+            game.update()
+            if not game.playing or game.lives.lives != self.lives or game.level_index != self.level_index:
+                break
+        self.steps += 1
+
+        score = game.score.score_val
+        reward = score - self.score
+        died = game.lives.lives < self.lives
+        won = game.win or game.level_index != self.level_index
+        done = died or won or not game.playing or (self.max_steps is not None and self.steps >= self.max_steps)
+
+        self.score = score
+        self.lives = game.lives.lives
+        self.level_index = game.level_index
+        info = {'score': score, 'level': game.level_index, 'lives': game.lives.lives,
+                'died': died, 'won': won, 'steps': self.steps}
+        return self.observe(), reward, done, info
+
+    def observe(self, tiles=None, velocity=None):
+        # fills tiles and velocity when given, the vector env passes its rows
+        game = self.game
+        if game.level is not self.classes_level:
+            self.classes = tile_classes(game.level, self.view_width, self.view_height)
+            self.classes_level = game.level
+
+        if tiles is None:
+            tiles = np.empty((self.view_height, self.view_width), dtype=np.uint8)
+        if velocity is None:
+            velocity = np.empty(2, dtype=np.float32)
+
+        player = game.player.sprites()[0]
+        level = game.level
+        column = min(max(player.rect.centerx // TILESIZE, 0), level.width - 1)
+        row = min(max(player.rect.centery // TILESIZE, 0), level.height - 1)
+        tiles[:] = self.classes[row:row + self.view_height, column:column + self.view_width]
+
+        # enemies move, so they are marked over the tiles each time
+        left = column - self.view_width // 2
+        top = row - self.view_height // 2
+        for enemy in game.enemy:
+            if enemy.action_state == ENEMY_SMUSH:
+                continue
+            x = enemy.rect.centerx // TILESIZE - left
+            y = enemy.rect.centery // TILESIZE - top
+            if 0 <= x < self.view_width and 0 <= y < self.view_height:
+                tiles[y, x] = OBS_ENEMY
+
+        velocity[0] = player.x_change
+        velocity[1] = player.y_change
+        return {'tiles': tiles, 'velocity': velocity}
+
+
+class VectorEnv:
+    # steps several environments in lockstep in this process, observations
+    # come back stacked. An environment whose episode ends is reset in the
+    # same step, its info keeps the last observation of the old episode
+    def __init__(self, count, **options):
+        self.envs = [DinioEnv(**options) for _ in range(count)]
+        self.count = count
+        self.action_count = len(ACTIONS)
+        first = self.envs[0]
+        self.tiles = np.zeros((count, first.view_height, first.view_width), dtype=np.uint8)
+        self.velocity = np.zeros((count, 2), dtype=np.float32)
+        self.steps = 0
+        self.seconds = 0.0
+
+    def reset(self):
+        for i, env in enumerate(self.envs):
+            env.reset()
+            env.observe(self.tiles[i], self.velocity[i])
+        return {'tiles': self.tiles.copy(), 'velocity': self.velocity.copy()}
+
+    def step(self, actions):
+        start = time.perf_counter()
+        rewards = np.zeros(self.count, dtype=np.float32)
+        dones = np.zeros(self.count, dtype=bool)
+        infos = []
+        for i, (env, action) in enumerate(zip(self.envs, actions)):
+            observation, reward, done, info = env.step(int(action))
+            if done:
+                info['final_observation'] = observation
+                env.reset()
+            env.observe(self.tiles[i], self.velocity[i])
+            rewards[i] = reward
+            dones[i] = done
+            infos.append(info)
+        self.steps += self.count
+        self.seconds += time.perf_counter() - start
+        return {'tiles': self.tiles.copy(), 'velocity': self.velocity.copy()}, rewards, dones, infos
+
+    @property
+    def steps_per_second(self):
+        return self.steps / self.seconds if self.seconds else 0.0
+
+
+if __name__ == '__main__':
+    # python env.py [--envs 8] [--steps 2000], random actions to time the environments
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Step the training environments with random actions.')
+    parser.add_argument('--envs', type=int, default=8, help='environments stepped in lockstep')
+    parser.add_argument('--steps', type=int, default=2000, help='steps for each environment')
+    parser.add_argument('--level', type=int, default=0)
+    parser.add_argument('--frame-skip', type=int, default=ENV_FRAME_SKIP)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    envs = VectorEnv(args.envs, level=args.level, frame_skip=args.frame_skip)
+    rng = np.random.default_rng(args.seed)
+    envs.reset()
+    episodes = 0
+    total = 0.0
+    for _ in range(args.steps):
+        observations, rewards, dones, infos = envs.step(rng.integers(envs.action_count, size=envs.count))
+        episodes += int(dones.sum())
+        total += float(rewards.sum())
+
+    print(f"{envs.steps} steps in {envs.seconds:.2f}s, {envs.steps_per_second:.0f} steps/s, "
+          f"{episodes} episodes, {total:.0f} total reward")
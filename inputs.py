@@ -0,0 +1,90 @@
+import pygame
+
+class KeyState:
+    def __init__(self, pressed=()):
+        self.pressed = frozenset(pressed)
+
+    # indexed like pygame.key.get_pressed()
+    def __getitem__(self, key):
+        return key in self.pressed
+
+
+class KeyboardInput:
+    def poll(self):
+        return pygame.key.get_pressed()
+
+
+class ScriptedInput:
+    def __init__(self, pressed=()):
+        self.keys = KeyState(pressed)
+
+    def set_keys(self, pressed):
+        self.keys = KeyState(pressed)
+
+    def press(self, *keys):
+        self.keys = KeyState(self.keys.pressed.union(keys))
+
+    def release(self, *keys):
+        self.keys = KeyState(self.keys.pressed.difference(keys))
+
+    def poll(self):
+        return self.keys
+
+
+# the keys the game reads, in the bit order recordings store them
+GAME_KEYS = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_UP, pygame.K_d, pygame.K_e)
+
+
+class RecordingInput:
+    # passes another source through and keeps its keys as [ticks, key mask] runs
+    def __init__(self, source, keys=GAME_KEYS):
+        self.source = source
+        self.keys = keys
+        self.runs = []
+
+    def reset(self):
+        self.runs = []
+
+    def poll(self):
+        pressed = self.source.poll()
+        mask = 0
+        for bit, key in enumerate(self.keys):
+            if pressed[key]:
+                mask |= 1 << bit
+
+        runs = self.runs
+        if runs and runs[-1][1] == mask:
+            runs[-1][0] += 1
+        else:
+            runs.append([1, mask])
+        return pressed
+
+
+class ReplayInput:
+    # plays recorded runs back one tick per poll, then releases every key
+    def __init__(self, runs, keys=GAME_KEYS):
+        self.runs = runs
+        self.keys = keys
+        self.states = {}
+        self.released = KeyState()
+        self.run = 0
+        self.left = runs[0][0] if runs else 0
+
+    @property
+    def finished(self):
+        return self.run >= len(self.runs)
+
+    def state(self, mask):
+        keys = self.states.get(mask)
+        if keys is None:
+            keys = self.states[mask] = KeyState(key for bit, key in enumerate(self.keys) if mask >> bit & 1)
+        return keys
+
+    def poll(self):
+        while self.left == 0:
+            self.run += 1
+            if self.finished:
+                return self.released
+            self.left = self.runs[self.run][0]
+        self.left -= 1
+        return self.state(self.runs[self.run][1])
@@ -0,0 +1,253 @@
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# compiled level layout:
+#   header    magic, version, width, height, entity count, and the size
+#             and CRC32 of the tilemap it was compiled from
+#   grid      width * height bytes, 0 for empty cells, else the tile character
+#   entities  x, y, character for every player and enemy start
+MAGIC = b'DLVL'
+VERSION = 2
+HEADER = struct.Struct('<4sHxxIIIII')
+ENTITY = struct.Struct('<IIc')
+
+EMPTY = 0
+EMPTY_CHAR = '.'
+ENTITY_CHARS = 'PE'
+COMPILED_SUFFIX = '.lvl'
+TILEMAP_SUFFIX = '.txt'
+
+NOT_EMPTY = re.compile(rb'[^\x00]')
+
+
+class Level:
+    def __init__(self, width, height, grid, entities, source=None):
+        self.width = width
+        self.height = height
+        self.grid = grid
+        self.entities = entities
+        self.source = source
+
+    def tile(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.grid[y * self.width + x]
+        return EMPTY
+
+    def tiles_in(self, left, top, right, bottom):
+        # non-empty cells with left <= x < right and top <= y < bottom
+        grid = self.grid
+        width = self.width
+        left = max(0, left)
+        right = min(width, right)
+        for y in range(max(0, top), min(self.height, bottom)):
+            start = y * width
+            for match in NOT_EMPTY.finditer(grid, start + left, start + right):
+                i = match.start()
+                yield i - start, y, chr(grid[i])
+
+    def close(self):
+        if isinstance(self.grid, memoryview):
+            buffer = self.grid.obj
+            self.grid.release()
+            buffer.close()
+
+
+def parse_tilemap(lines, source=None):
+    rows = [line.strip() for line in lines]
+    rows = [row for row in rows if row] or ['']
+
+    # stray empty cells past the first row don't widen the level
+    width = max([len(rows[0])] + [len(row.rstrip(EMPTY_CHAR)) for row in rows])
+    height = len(rows)
+
+    grid = bytearray(width * height)
+    entities = []
+    for y, row in enumerate(rows):
+        for x, char in enumerate(row[:width]):
+            if char == EMPTY_CHAR:
+                continue
+            if char in ENTITY_CHARS:
+                entities.append((x, y, char))
+            else:
+                grid[y * width + x] = ord(char)
+
+    return Level(width, height, grid, entities, source)
+
+
+def read_tilemap(file_path):
+    with open(file_path, 'r') as file:
+        return parse_tilemap(file.readlines(), file_path)
+
+
+def read_compiled(file_path):
+    with open(file_path, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, width, height, entity_count, _, _ = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION:
+        buffer.close()
+        raise ValueError(f"{file_path} is not a compiled level")
+
+    # the grid is read straight from the mapped file
+    grid_start = HEADER.size
+    grid_end = grid_start + width * height
+    grid = memoryview(buffer)[grid_start:grid_end]
+
+    entities = []
+    for i in range(entity_count):
+        x, y, char = ENTITY.unpack_from(buffer, grid_end + i * ENTITY.size)
+        entities.append((x, y, char.decode('ascii')))
+
+    return Level(width, height, grid, entities, file_path)
+
+
+def load_level(file_path):
+    with open(file_path, 'rb') as file:
+        compiled = file.read(len(MAGIC)) == MAGIC
+    if compiled:
+        return read_compiled(file_path)
+    return read_tilemap(file_path)
+
+
+def source_fingerprint(file_path):
+    # line endings are left out, a checkout may rewrite them
+    with open(file_path, 'rb') as file:
+        data = file.read().replace(b'\r\n', b'\n')
+    return len(data), zlib.crc32(data)
+
+
+def compiled_fingerprint(file_path):
+    # the fingerprint of the tilemap a compiled level was built from, None
+    # for a file from an older version
+    with open(file_path, 'rb') as file:
+        data = file.read(HEADER.size)
+    if len(data) < HEADER.size:
+        return None
+    magic, version, width, height, entity_count, size, crc = HEADER.unpack(data)
+    if magic != MAGIC or version != VERSION:
+        return None
+    return size, crc
+
+
+def write_compiled(level, file_path, fingerprint=(0, 0)):
+    with open(file_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, level.width, level.height, len(level.entities), *fingerprint))
+        file.write(bytes(level.grid))
+        for x, y, char in level.entities:
+            file.write(ENTITY.pack(x, y, char.encode('ascii')))
+
+
+def compile_level(source_path, file_path=None):
+    if file_path is None:
+        file_path = os.path.splitext(source_path)[0] + COMPILED_SUFFIX
+    write_compiled(read_tilemap(source_path), file_path, source_fingerprint(source_path))
+    return file_path
+
+
+def read_info(file_path):
+    # level size and entity counts without building the level
+    with open(file_path, 'rb') as file:
+        data = file.read(HEADER.size)
+        if data[:len(MAGIC)] == MAGIC:
+            magic, version, width, height, entity_count, _, _ = HEADER.unpack(data)
+            file.seek(HEADER.size + width * height)
+            entities = file.read(entity_count * ENTITY.size)
+            chars = entities[ENTITY.size - 1::ENTITY.size]
+        else:
+            rows = (data + file.read()).split()
+            height = len(rows)
+            width = len(rows[0]) if rows else 0
+            chars = b''.join(rows)
+
+    return {
+        'width': width,
+        'height': height,
+        'players': chars.count(b'P'),
+        'enemies': chars.count(b'E'),
+    }
+
+
+def natural_key(name):
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', name)]
+
+
+def pick_source(compiled, tilemap):
+    # the compiled file while it matches the tilemap it was built from, file
+    # times are no use here since a checkout writes both in any order
+    if compiled is None or tilemap is None:
+        return compiled or tilemap
+    if compiled_fingerprint(compiled) == source_fingerprint(tilemap):
+        return compiled
+    print(f"{compiled} is stale, reading {tilemap} instead. "
+          f"Run python levels.py {tilemap} to compile it again", file=sys.stderr)
+    return tilemap
+
+
+class LevelCatalogue:
+    def __init__(self, directory):
+        self.directory = directory
+
+        # one entry per level name, the compiled file unless its tilemap
+        # was edited after it was compiled
+        sources = {}
+        for name in os.listdir(directory):
+            stem, suffix = os.path.splitext(name)
+            if suffix in (COMPILED_SUFFIX, TILEMAP_SUFFIX):
+                sources.setdefault(stem, {})[suffix] = os.path.join(directory, name)
+        self.names = sorted(sources, key=natural_key)
+        self.paths = [pick_source(sources[name].get(COMPILED_SUFFIX), sources[name].get(TILEMAP_SUFFIX))
+                      for name in self.names]
+
+        # index -> Level, or a Future while it is being prefetched
+        self.loaded = {}
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, index):
+        with self.lock:
+            level = self.loaded.get(index)
+        if level is None:
+            level = load_level(self.paths[index])
+        elif isinstance(level, Future):
+            level = level.result()
+        with self.lock:
+            self.loaded[index] = level
+        return level
+
+    def info(self, index):
+        return read_info(self.paths[index])
+
+    def prefetch(self, index):
+        # load the level on a worker thread while the current one is played
+        if not 0 <= index < len(self.paths):
+            return
+        with self.lock:
+            if index in self.loaded:
+                return
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=1)
+            self.loaded[index] = self.executor.submit(load_level, self.paths[index])
+
+    def release(self, keep=()):
+        # close every loaded level except the ones in keep
+        with self.lock:
+            released = [self.loaded.pop(index) for index in list(self.loaded) if index not in keep]
+        for level in released:
+            if isinstance(level, Future):
+                level = level.result()
+            level.close()
+
+
+if __name__ == '__main__':
+    # python levels.py assets/levels/*.txt
+    for path in sys.argv[1:]:
+        print(compile_level(path))
@@ -2,24 +2,69 @@ import pygame
 from sprites import *
 from utils import *
 from config import *
+from resources import ASSETS, FONTS, SCALED_SURFACES
+from collision import CollisionGrid
+from render import TileLayer, SurfaceRenderer, DirectRenderer, DirtyRects, REPAINT_EVENTS
+from inputs import KeyboardInput, ScriptedInput
+from levels import LevelCatalogue
+from world import ChunkStreamer
+from profiler import FrameProfiler
+from replay import Recorder, REPLAY_SUFFIX
+from physics import PhysicsParams
+try:
+    from enemies import EnemyBatch
+except ImportError:
+    # numpy is optional, enemies update one by one without it
+    EnemyBatch = None
+import os
 import sys
+import time
 
 class Game:
-    def __init__(self):
+    def __init__(self, headless=False, input_source=None, profile=False):
+        # headless runs without a window, sound or frame rate cap
+        self.headless = headless
+        if headless:
+            os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+            os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
         pygame.init()
-        self.screen = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT), pygame.RESIZABLE)
+        if headless:
+            self.screen = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
+        else:
+            self.screen = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT), pygame.RESIZABLE)
 
         pygame.display.set_caption('Dinio')
         self.clock = pygame.time.Clock()
         self.running = True
         self.scale_factor = 1
 
-        self.font = pygame.font.Font(resource_path(MAIN_FONT), FONT_SIZE)
-        self.intro_background = pygame.image.load(resource_path(IMG_INTRO))
-        self.go_background = pygame.image.load(resource_path(IMG_GAME_OVER))
-        self.gw_background = pygame.image.load(resource_path(IMG_GAME_WIN))
+        # game time in ms, advanced by one fixed step per update
+        self.ticks = 0
+        self.tick_ms = 1000 / TICK_RATE
+        self.enemy_batch = None
+
+        # this game's gravity, friction and speeds, set from the options screen
+        self.physics = PhysicsParams()
+
+        # level art is cached per game, so evicting it leaves other games alone
+        self.asset_scope = ('level', id(self))
+
+        if input_source is None:
+            input_source = ScriptedInput() if headless else KeyboardInput()
+        self.input = input_source
+        self.keys = self.input.poll()
 
-        self.levels = LEVELS
+        self.font = FONTS.get(MAIN_FONT, FONT_SIZE)
+        if not headless:
+            self.intro_background = pygame.image.load(resource_path(IMG_INTRO)).convert_alpha()
+            self.go_background = pygame.image.load(resource_path(IMG_GAME_OVER)).convert_alpha()
+            self.gw_background = pygame.image.load(resource_path(IMG_GAME_WIN)).convert_alpha()
+            SCALED_SURFACES.prescale([self.intro_background, self.go_background, self.gw_background],
+                                     PRESCALE_WINDOW_SIZES)
+
+        # levels are loaded when first played
+        self.levels = LevelCatalogue(resource_path(LEVEL_DIR))
         self.level_index = 0
 
         self.timer = Timer(game=self, x=WIN_WIDTH-105, y=0, 
@@ -39,27 +84,44 @@ class Game:
                            scale_factor=self.scale_factor)
 
         pygame.mixer.init()
-        pygame.mixer.music.load(resource_path(MUSIC_MAIN))
-        self.win_sound = pygame.mixer.Sound(resource_path(SOUND_WIN))
-        self.win_sound.set_volume(VOL_SOUND)
-        self.lose_sound = pygame.mixer.Sound(resource_path(SOUND_GAME_OVER))
-        self.lose_sound.set_volume(VOL_SOUND)
+        if not headless:
+            pygame.mixer.music.load(resource_path(MUSIC_MAIN))
+        self.win_sound = ASSETS.sound(SOUND_WIN, VOL_SOUND)
+        self.lose_sound = ASSETS.sound(SOUND_GAME_OVER, VOL_SOUND)
 
         self.win = False
 
+        if RENDERER == 'direct':
+            self.renderer = DirectRenderer(INTEGER_SCALE)
+        else:
+            self.renderer = SurfaceRenderer()
+        self.dirty = DirtyRects()
+
+        # frame timings and counters, F3 shows them over the HUD
+        self.profiler = FrameProfiler(self)
+        if profile:
+            self.profiler.start()
+
     def createTilemap(self, level):
-        for i, row in enumerate(level):
-            for j, column in enumerate(row):
-                if column == "B":
-                    Block1(self, j, i)
-                if column == "G":
-                    Block2(self, j, i)
-                if column == "P":
-                    Player(self, j, i)
-                if column == "E":
-                    Enemy(self, j, i)
-                if column == "F":
-                    Flag(self, j, i)
+        # the level grid is the tile layer, there is no sprite per tile
+        self.level = level
+        self.renderer.clear()
+
+        # static tiles are drawn from pre-rendered chunks
+        self.tile_layer = TileLayer(level, self.asset_scope)
+        self.collision = CollisionGrid(TILESIZE)
+
+        for j, i, column in level.entities:
+            if column == "P":
+                Player(self, j, i)
+
+        self.enemy_batch = None
+        if ENEMY_BATCH and EnemyBatch is not None:
+            self.enemy_batch = EnemyBatch(self, level)
+
+        # enemies and collision spans only exist for the chunks around the camera
+        self.world = ChunkStreamer(self, level)
+        self.world.update(self.camera.view_rect.union(self.player.sprites()[0].rect))
 
     def new(self):
         #a new game starts
@@ -68,19 +130,22 @@ class Game:
         self.waiting_for_restart = False
 
         self.all_sprites = pygame.sprite.LayeredUpdates()
-        self.blocks = pygame.sprite.LayeredUpdates()
+        self.actors = pygame.sprite.LayeredUpdates()
         self.player = pygame.sprite.LayeredUpdates()
         self.enemy = pygame.sprite.LayeredUpdates()
         self.enemies = pygame.sprite.LayeredUpdates()
-        self.flag = pygame.sprite.LayeredUpdates()
 
         self.level_index = 0
+        self.levels.release(keep=(self.level_index,))
 
-        self.createTilemap(self.levels[self.level_index])
         self.camera = Camera(WIN_WIDTH, WIN_HEIGHT, 
-                             len(self.levels[self.level_index][0]) * TILESIZE, 
-                             len(self.levels[self.level_index]) * TILESIZE)
-        
+                             self.levels[self.level_index].width * TILESIZE, 
+                             self.levels[self.level_index].height * TILESIZE)
+        self.createTilemap(self.levels[self.level_index])
+        self.levels.prefetch(self.level_index + 1)
+
+        # the menus scale to fit the window, the game scales the way its renderer does
+        self.scale_factor = self.renderer.fit_scale(*self.screen.get_size())
         self.timer.reset_time()
         self.timer.update_position(self.scale_factor)
 
@@ -89,13 +154,15 @@ class Game:
 
         self.lives.reset_lives()
         self.lives.update_position(self.scale_factor)
-        
-        pygame.mixer.music.play(-1)
+
+        if not self.headless:
+            pygame.mixer.music.play(-1)
 
     def reset_level(self):
         for sprite in self.all_sprites:
             sprite.kill()
 
+        self.scale_factor = self.renderer.fit_scale(*self.screen.get_size())
         self.timer.reset_time()
         self.timer.update_position(self.scale_factor)
 
@@ -104,17 +171,22 @@ class Game:
         self.lives.update_position(self.scale_factor)
 
         self.camera = Camera(WIN_WIDTH, WIN_HEIGHT, 
-                             len(self.levels[self.level_index][0]) * TILESIZE, 
-                             len(self.levels[self.level_index]) * TILESIZE)
+                             self.levels[self.level_index].width * TILESIZE, 
+                             self.levels[self.level_index].height * TILESIZE)
 
         self.createTilemap(self.levels[self.level_index])
 
-        pygame.mixer.music.play(-1)
+        if not self.headless:
+            pygame.mixer.music.play(-1)
 
     def next_level(self):
         self.level_index += 1
-        if self.level_index < len(LEVELS):
+        if self.level_index < len(self.levels):
+            # drop the finished level's art, retries reuse it
+            ASSETS.evict(self.asset_scope)
+            self.levels.release(keep=(self.level_index,))
             self.reset_level()
+            self.levels.prefetch(self.level_index + 1)
         else:
             self.win_game()
 
@@ -134,50 +206,104 @@ class Game:
                 self.running = False
             elif event.type == pygame.VIDEORESIZE:
                 self.screen = pygame.display.set_mode((event.w, event.h), pygame.RESIZABLE)
-                self.scale_factor = min(event.w / WIN_WIDTH, event.h / WIN_HEIGHT)
+                self.scale_factor = self.renderer.fit_scale(event.w, event.h)
                 self.timer.update_position(self.scale_factor)
                 self.score.update_position(self.scale_factor)
                 self.lives.update_position(self.scale_factor)
+            elif event.type in REPAINT_EVENTS:
+                self.dirty.invalidate()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.profiler.toggle()
+
+        if self.profiler.enabled:
+            self.profiler.lap('events')
 
     def update(self):
         #game loop updates
-        self.all_sprites.update()
+        self.ticks += self.tick_ms
+        self.keys = self.input.poll()
+        profiler = self.profiler
+        if profiler.enabled:
+            profiler.updates += 1
+
+        if self.enemy_batch is not None:
+            self.enemy_batch.update()
+        else:
+            for enemy in self.camera.active(self.enemy):
+                enemy.update()
+        if profiler.enabled:
+            profiler.lap('enemies')
+
+        self.player.update()
+        if profiler.enabled:
+            profiler.lap('player')
+
         self.camera.update(self.player.sprites()[0])
+        self.world.update(self.camera.view_rect)
 
         if self.timer.times_up():
             self.lives.lose_life()
-
-    def draw(self):
-        #game loop draw
-        predraw_surface = pygame.Surface((WIN_WIDTH, WIN_HEIGHT))
-        predraw_surface.fill(LIGHT_BLUE)
-        for sprite in self.all_sprites:
-            predraw_surface.blit(sprite.image, self.camera.apply(sprite))
-
-        adj_width = int(WIN_WIDTH * self.scale_factor)
-        adj_height = int(WIN_HEIGHT * self.scale_factor)
-
-        scaled_surface = pygame.transform.scale(predraw_surface, (adj_width, adj_height))
-
-        x_pad = (self.screen.get_width() - adj_width) // 2
-        y_pad = (self.screen.get_height() - adj_height) // 2
-
-        self.screen.fill((BLACK))
-        self.screen.blit(scaled_surface, (x_pad, y_pad))
-
-        self.timer.draw(self.screen, offset=(x_pad, y_pad))
-        self.score.draw(self.screen, offset=(x_pad, y_pad))
-        self.lives.draw(self.screen, offset=(x_pad, y_pad))
-
-        self.clock.tick(FPS)
-        pygame.display.update()
+        if profiler.enabled:
+            profiler.lap('world')
+
+    def draw(self, alpha=1):
+        #game loop draw, alpha blends between the last two physics steps
+        dirty = self.dirty
+        dirty.begin((self.screen.get_size(), self.scale_factor, self.tile_layer, self.camera.offset(alpha)))
+        x_pad, y_pad = self.renderer.draw(self.screen, self.scale_factor, self.tile_layer,
+                                          self.camera, self.actors, alpha, dirty)
+        profiler = self.profiler
+        if profiler.enabled:
+            profiler.lap('draw')
+
+        self.timer.draw(self.screen, offset=(x_pad, y_pad), dirty=dirty)
+        self.score.draw(self.screen, offset=(x_pad, y_pad), dirty=dirty)
+        self.lives.draw(self.screen, offset=(x_pad, y_pad), dirty=dirty)
+        if profiler.enabled:
+            profiler.draw(self.screen, offset=(x_pad, y_pad), dirty=dirty)
+            profiler.lap('hud')
+
+        if not self.headless:
+            self.clock.tick(FPS)
+            if profiler.enabled:
+                profiler.lap('idle')
+        dirty.update()
+        if profiler.enabled:
+            profiler.lap('display')
 
     def main(self):
-        #game loop
+        #game loop, runs fixed physics steps and draws in between them
+        step = 1 / TICK_RATE
+        accumulator = 0
+        previous = time.perf_counter()
+
         while self.playing:
+            now = time.perf_counter()
+            accumulator += min(now - previous, MAX_FRAME_TIME)
+            previous = now
+
+            self.events()
+            while accumulator >= step and self.playing:
+                self.update()
+                accumulator -= step
+
+            if self.playing:
+                self.draw(accumulator / step)
+            if self.profiler.enabled:
+                self.profiler.end()
+
+    def simulate(self, frames=None, render=False):
+        #headless game loop, runs updates as fast as possible
+        frame = 0
+        while self.playing and (frames is None or frame < frames):
             self.events()
             self.update()
-            self.draw()
+            if render:
+                self.draw()
+            if self.profiler.enabled:
+                self.profiler.end()
+            frame += 1
+        return frame
 
     def game_over(self):
         pygame.mixer.music.stop()
@@ -190,14 +316,18 @@ class Game:
         button_x = (WIN_WIDTH - button_width) / 2
         button_y = (WIN_HEIGHT - button_height) / 2
         restart_button = Button(button_x, button_y, button_width, button_height, WHITE, BLACK, 'Restart', 32, self.scale_factor)
+        dirty = DirtyRects()
 
         for sprite in self.all_sprites:
             sprite.kill()
+        ASSETS.evict(self.asset_scope)
 
         while self.waiting_for_restart and self.running:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     self.running = False
+                elif event.type in REPAINT_EVENTS:
+                    dirty.invalidate()
 
             mouse_pos = pygame.mouse.get_pos()
             mouse_pressed = pygame.mouse.get_pressed()
@@ -219,13 +349,14 @@ class Game:
                 self.waiting_for_restart = False
                 return
 
-            scaled_go_background = pygame.transform.scale(self.go_background, (adj_width, adj_height))
+            scaled_go_background = SCALED_SURFACES.get(self.go_background, (adj_width, adj_height))
 
+            dirty.begin((screen_width, screen_height, self.scale_factor))
             self.screen.fill(BLACK)
             self.screen.blit(scaled_go_background, (x_pad, y_pad))
             self.screen.blit(restart_button.image, (x_pad + button_x * self.scale_factor, y_pad + button_y * self.scale_factor))
             self.clock.tick(FPS)
-            pygame.display.update()
+            dirty.update()
 
     def game_win(self):
         for sprite in self.player:
@@ -240,14 +371,18 @@ class Game:
                 button_x = (WIN_WIDTH - button_width) / 2
                 button_y = (WIN_HEIGHT - button_height) / 2
                 restart_button = Button(button_x, button_y, button_width, button_height, WHITE, BLACK, 'Restart', 32, self.scale_factor)
+                dirty = DirtyRects()
 
                 for sprite in self.all_sprites:
                     sprite.kill()
+                ASSETS.evict(self.asset_scope)
 
                 while self.waiting_for_restart and self.running:
                     for event in pygame.event.get():
                         if event.type == pygame.QUIT:
                             self.running = False
+                        elif event.type in REPAINT_EVENTS:
+                            dirty.invalidate()
 
                     mouse_pos = pygame.mouse.get_pos()
                     mouse_pressed = pygame.mouse.get_pressed()
@@ -269,13 +404,14 @@ class Game:
                         self.waiting_for_restart = False
                         return
 
-                    scaled_gw_background = pygame.transform.scale(self.gw_background, (adj_width, adj_height))
+                    scaled_gw_background = SCALED_SURFACES.get(self.gw_background, (adj_width, adj_height))
 
+                    dirty.begin((screen_width, screen_height, self.scale_factor))
                     self.screen.fill(BLACK)
                     self.screen.blit(scaled_gw_background, (x_pad, y_pad))
                     self.screen.blit(restart_button.image, (x_pad + button_x * self.scale_factor, y_pad + button_y * self.scale_factor))
                     self.clock.tick(FPS)
-                    pygame.display.update()
+                    dirty.update()
             else:
                 pass
 
@@ -290,12 +426,15 @@ class Game:
         options_button = Button(x=WIN_WIDTH-140, y=0, width=120, height=50, 
                                 fg=WHITE, bg=BLACK, content='Options', 
                                 fontsize=32, scale_factor=self.scale_factor)
+        dirty = DirtyRects()
 
         while intro and self.running:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     intro = False
                     self.running = False
+                elif event.type in REPAINT_EVENTS:
+                    dirty.invalidate()
 
             mouse_pos = pygame.mouse.get_pos()
             mouse_pressed = pygame.mouse.get_pressed()
@@ -314,21 +453,24 @@ class Game:
             adj_mouse_y = mouse_pos[1] - y_pad
             adj_mouse_pos = (adj_mouse_x, adj_mouse_y)
 
-            scaled_intro_background = pygame.transform.scale(self.intro_background, (adj_width, adj_height))
+            scaled_intro_background = SCALED_SURFACES.get(self.intro_background, (adj_width, adj_height))
 
+            dirty.begin((screen_width, screen_height, self.scale_factor))
             self.screen.fill(BLACK)
             self.screen.blit(scaled_intro_background, (x_pad, y_pad))
             self.screen.blit(play_button.image, (x_pad + button_x * self.scale_factor, y_pad + button_y * self.scale_factor))
             self.screen.blit(options_button.image, (x_pad + options_button.initial_x * self.scale_factor, y_pad + options_button.initial_y * self.scale_factor))
 
             self.clock.tick(FPS)
-            pygame.display.update()
+            dirty.update()
 
             if play_button.is_pressed(adj_mouse_pos, mouse_pressed):
                 intro = False
 
             if options_button.is_pressed(adj_mouse_pos, mouse_pressed):
                 self.options_screen()
+                # the options screen drew over everything
+                dirty = DirtyRects()
 
     def options_screen(self):
         options = True
@@ -338,37 +480,40 @@ class Game:
                                 fontsize=32, scale_factor=self.scale_factor)
         
         gravity_slider = Slider(x=150, y=200, width=280, height=10, 
-                                fg=WHITE, getvalue=lambda: config.GRAVITY, 
-                                setvalue=lambda val: setattr(config, "GRAVITY", val),
+                                fg=WHITE, getvalue=lambda: self.physics.gravity, 
+                                setvalue=lambda val: self.physics.set("gravity", val),
                                 name="Gravity", scale_factor=self.scale_factor)
         
         friction_slider = Slider(x=150, y=250, width=280, height=10, 
-                                fg=WHITE, getvalue=lambda: config.FRICTION, 
-                                setvalue=lambda val: setattr(config, "FRICTION", val),
+                                fg=WHITE, getvalue=lambda: self.physics.friction, 
+                                setvalue=lambda val: self.physics.set("friction", val),
                                 name="Friction", scale_factor=self.scale_factor)
         
         air_res_slider = Slider(x=150, y=300, width=280, height=10, 
-                                fg=WHITE, getvalue=lambda: config.AIR_RESISTANCE, 
-                                setvalue=lambda val: setattr(config, "AIR_RESISTANCE", val),
+                                fg=WHITE, getvalue=lambda: self.physics.air_resistance, 
+                                setvalue=lambda val: self.physics.set("air_resistance", val),
                                 name="Air Resistance", scale_factor=self.scale_factor)
         
         player_speed_slider = Slider(x=150, y=350, width=280, height=10, 
-                                fg=WHITE, getvalue=lambda: config.PLAYER_SPEED, 
-                                setvalue=lambda val: setattr(config, "PLAYER_SPEED", val),
+                                fg=WHITE, getvalue=lambda: self.physics.player_speed, 
+                                setvalue=lambda val: self.physics.set("player_speed", val),
                                 name="Acceleration", scale_factor=self.scale_factor,
                                 max_value=5)
         
         max_speed_slider = Slider(x=150, y=400, width=280, height=10, 
-                                fg=WHITE, getvalue=lambda: config.PLAYER_MAX_SPEED, 
-                                setvalue=lambda val: setattr(config, "PLAYER_MAX_SPEED", val),
+                                fg=WHITE, getvalue=lambda: self.physics.player_max_speed, 
+                                setvalue=lambda val: self.physics.set("player_max_speed", val),
                                 name="Max Speed", scale_factor=self.scale_factor, 
                                 max_value=100)
+        dirty = DirtyRects()
 
         while options and self.running:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     options = False
                     self.running = False
+                elif event.type in REPAINT_EVENTS:
+                    dirty.invalidate()
 
                 gravity_slider.interact(event)
                 friction_slider.interact(event)
@@ -400,30 +545,47 @@ class Game:
             if exit_button.is_pressed(adj_mouse_pos, mouse_pressed):
                 options = False
 
-            scaled_intro_background = pygame.transform.scale(self.intro_background, (adj_width, adj_height))
+            scaled_intro_background = SCALED_SURFACES.get(self.intro_background, (adj_width, adj_height))
 
+            dirty.begin((screen_width, screen_height, self.scale_factor))
             self.screen.fill(BLACK)
             self.screen.blit(scaled_intro_background, (x_pad, y_pad))
             self.screen.blit(exit_button.image, (x_pad + 10 * self.scale_factor, y_pad + 0 * self.scale_factor))
-            gravity_slider.draw(self.screen)
-            friction_slider.draw(self.screen)
-            air_res_slider.draw(self.screen)
-            player_speed_slider.draw(self.screen)
-            max_speed_slider.draw(self.screen)
+            gravity_slider.draw(self.screen, dirty)
+            friction_slider.draw(self.screen, dirty)
+            air_res_slider.draw(self.screen, dirty)
+            player_speed_slider.draw(self.screen, dirty)
+            max_speed_slider.draw(self.screen, dirty)
 
             self.clock.tick(FPS)
-            pygame.display.update()
-
-g = Game()
-g.intro_screen()
-while g.running:
-    g.new()
-    g.main()
-
-    if g.win:
-        g.game_win()
-    else:
-        g.game_over()
+            dirty.update()
+
+if __name__ == '__main__':
+    # python main.py --record run.rpl saves each game played as run-1.rpl, run-2.rpl, ...
+    record_path = None
+    if '--record' in sys.argv[1:-1]:
+        record_path = sys.argv[sys.argv.index('--record') + 1]
+
+    g = Game()
+    recorder = Recorder(g) if record_path else None
+    g.intro_screen()
+    games = 0
+    while g.running:
+        g.new()
+        if recorder:
+            recorder.start()
+        g.main()
+
+        if recorder:
+            games += 1
+            stem, suffix = os.path.splitext(record_path)
+            recorder.save(f"{stem}-{games}{suffix or REPLAY_SUFFIX}")
+
+        if g.win:
+            g.game_win()
+        else:
+            g.game_over()
 
-pygame.quit()
-sys.exit()
+    g.profiler.close()
+    pygame.quit()
+    sys.exit()
@@ -1,13 +1,25 @@
 import pygame
 from config import *
+from resources import FONTS
 
 class AnimatedSprite(pygame.sprite.Sprite):
-    def __init__(self, x, y, *groups):
+    # Sprite has no __slots__, but the per-tick state still lives in slots
+    __slots__ = ('game', '_layer', 'image', 'rect', 'previous', 'width', 'height',
+                 'animation_list', 'flipped_list', 'facing', 'action_state', 'frame',
+                 'last_update', 'animation_rate', 'x', 'y', 'x_change', 'y_change',
+                 'move_state', 'grounded')
+
+    def __init__(self, game, x, y, *groups):
         super().__init__(*groups)
+        self.game = game
+
+        # frames are shared surfaces, flipped_list holds the left facing copies
         self.animation_list = []
+        self.flipped_list = None
+        self.facing = MOVE_RIGHT
         self.action_state = 0
         self.frame = 0
-        self.last_update = pygame.time.get_ticks()
+        self.last_update = self.game.ticks
         self.animation_rate = PLAYER_ANIMATION_SPEED
 
         self.x = x * TILESIZE
@@ -16,19 +28,19 @@ class AnimatedSprite(pygame.sprite.Sprite):
         self.x_change = 0
         self.y_change = 0
 
-        self.move_state = 'left'
+        self.move_state = MOVE_LEFT
         self.grounded = True
     
     def set_action_state(self, new_state, new_rate=None):
         if self.action_state != new_state:
             self.action_state = new_state
             self.frame = 0
-            self.last_update = pygame.time.get_ticks()
+            self.last_update = self.game.ticks
             if new_rate:
                 self.animation_rate = new_rate
 
     def animate(self):
-        current_time = pygame.time.get_ticks()
+        current_time = self.game.ticks
 
         if current_time - self.last_update >= self.animation_rate:
             self.frame += 1
@@ -37,19 +49,32 @@ class AnimatedSprite(pygame.sprite.Sprite):
             if self.frame >= len(self.animation_list[self.action_state]):
                 self.frame = 0
 
-        self.image = pygame.Surface([self.width, self.height], pygame.SRCALPHA)
-        self.image.blit(self.animation_list[self.action_state][self.frame], (0, 0))
+        self.image = self.current_frames()[self.action_state][self.frame]
+
+    def current_frames(self):
+        if self.flipped_list is not None and self.facing == MOVE_LEFT:
+            return self.flipped_list
+        return self.animation_list
+
+    def interpolate(self, alpha):
+        # position between the last two physics steps
+        previous_x, previous_y = self.previous
+        return (previous_x + (self.rect.x - previous_x) * alpha,
+                previous_y + (self.rect.y - previous_y) * alpha)
 
     def collision_detect(self, direction):
-        hits = pygame.sprite.spritecollide(self, self.game.blocks, False)
+        hits = self.game.collision.collide(self.rect)
         if direction == 'x':
             if hits:
+                # hits are runs of tiles, resolve against the first tile of
+                # the run the actor overlaps rather than the end of the run
+                tile = max(hits[0].rect.left, self.rect.left // TILESIZE * TILESIZE)
                 if self.x_change > 0:
-                    self.rect.right = hits[0].rect.left
-                    self.move_state = 'left'
+                    self.rect.right = tile
+                    self.move_state = MOVE_LEFT
                 elif self.x_change < 0:
-                    self.rect.left = hits[0].rect.right
-                    self.move_state = 'right'
+                    self.rect.left = tile + TILESIZE
+                    self.move_state = MOVE_RIGHT
                 self.x_change = 0
         elif direction == 'y':
             if hits:
@@ -64,7 +89,7 @@ class AnimatedSprite(pygame.sprite.Sprite):
 
     def check_if_falling(self):
         self.rect.y += 1
-        hits = pygame.sprite.spritecollide(self, self.game.blocks, False)
+        hits = self.game.collision.collide(self.rect)
         if not hits:
             self.grounded = False
         else:
@@ -72,40 +97,6 @@ class AnimatedSprite(pygame.sprite.Sprite):
         self.rect.y -= 1
 
 
-class Block(pygame.sprite.Sprite):
-    def __init__(self, game, x, y, sprite, *groups):
-        super().__init__(*groups)
-
-        self.game = game
-        self._layer = BLOCK_LAYER
-
-        self.x = x * TILESIZE
-        self.y = y * TILESIZE
-        self.width = TILESIZE
-        self.height = TILESIZE
-
-        block_sprite = pygame.image.load(resource_path(sprite)).convert_alpha()
-
-        #load sprite
-        self.image = pygame.Surface([self.width, self.height], pygame.SRCALPHA)
-        self.image.blit(block_sprite, (0, 0))
-
-        self.rect = self.image.get_rect()
-        self.rect.x = self.x
-        self.rect.y = self.y
-
-
-class SpriteSheet():
-    def __init__(self, image):
-        self.sheet = image
-
-    #animate spritesheet
-    def get_image(self, frame, width, height):
-        image = pygame.Surface((width, height), pygame.SRCALPHA).convert_alpha()
-        image.blit(self.sheet, (0, 0), ((frame * width), 0, width, height))
-        return image
-
-
 class DisplayText():
     def __init__(self, x, y, width, height, fg, content, fontsize, scale_factor, bg=None):
         self.initial_x = x
@@ -118,10 +109,15 @@ class DisplayText():
         self.bg = bg
 
         self.scale_factor = scale_factor
+        self.layout_scale = None
 
         self.update_position(self.scale_factor)
 
     def update_position(self, scale_factor):
+        # layout only changes with the scale
+        if scale_factor == self.layout_scale:
+            return
+        self.layout_scale = scale_factor
         self.scale_factor = scale_factor
 
         self.x = int(self.initial_x * self.scale_factor)
@@ -134,7 +130,7 @@ class DisplayText():
             self.image.fill(self.bg)
 
         scaled_fontsize = int(self.fontsize * self.scale_factor)
-        self.font = pygame.font.Font(resource_path(MAIN_FONT), scaled_fontsize)
+        self.font = FONTS.get(MAIN_FONT, scaled_fontsize)
         self.text = self.font.render(self.content, True, self.fg)
 
         self.text_rect = self.text.get_rect(center=(self.width / 2, self.height / 2))
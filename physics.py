@@ -0,0 +1,34 @@
+from config import *
+
+# the settings the options sliders change, in replay file order
+FIELDS = ('gravity', 'friction', 'air_resistance', 'player_speed', 'player_max_speed')
+
+
+class PhysicsParams:
+    # one set per game, so games with different settings can run side by side.
+    # The actors read it once per update, the products they use are kept
+    # here so they are only worked out when a setting changes
+    __slots__ = FIELDS + ('fall_gravity', 'air_friction', 'air_speed')
+
+    def __init__(self, gravity=GRAVITY, friction=FRICTION, air_resistance=AIR_RESISTANCE,
+                 player_speed=PLAYER_SPEED, player_max_speed=PLAYER_MAX_SPEED):
+        self.gravity = gravity
+        self.friction = friction
+        self.air_resistance = air_resistance
+        self.player_speed = player_speed
+        self.player_max_speed = player_max_speed
+        self.derive()
+
+    def derive(self):
+        self.fall_gravity = self.gravity * FAST_FALL_MOD
+        self.air_friction = self.friction * self.air_resistance
+        self.air_speed = self.player_speed * AIR_MOD
+
+    def set(self, name, value):
+        if name not in FIELDS:
+            raise AttributeError(f"{name} is not a physics setting")
+        setattr(self, name, value)
+        self.derive()
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in FIELDS}
@@ -0,0 +1,170 @@
+import csv
+import json
+import os
+import time
+from collections import deque
+from config import *
+from resources import ASSETS, FONTS, TEXT_CACHE, SCALED_SURFACES
+
+# frame phases in the order the game loop runs them, idle is the wait for the frame cap
+PHASES = ('events', 'enemies', 'player', 'world', 'draw', 'hud', 'idle', 'display')
+# log field -> sprite group on the game
+GROUPS = {'all_sprites': 'all_sprites', 'actors': 'actors', 'enemy_sprites': 'enemy', 'player_sprites': 'player'}
+
+
+class FrameProfiler:
+    # times the phases of each frame and counts sprites, collision queries and
+    # new surfaces. The game only calls in while enabled, so it costs nothing off
+    def __init__(self, game, log_path=PROFILE_LOG, log_lines=PROFILE_LOG_LINES):
+        self.game = game
+        self.enabled = False
+
+        self.log_path = log_path
+        self.log_lines = log_lines
+        self.log = None
+        self.writer = None
+        self.lines = 0
+
+        self.history = deque(maxlen=PROFILE_HISTORY)
+        self.frames = 0
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.updates = 0
+        self.mark = 0
+
+        self.collision = None
+        self.queries = 0
+        self.surfaces = 0
+
+        self.overlay = []
+        self.overlay_frame = 0
+        self.font = None
+        self.font_scale = None
+
+    def toggle(self):
+        if self.enabled:
+            self.stop()
+        else:
+            self.start()
+
+    def start(self):
+        self.enabled = True
+        self.history.clear()
+        self.overlay = []
+        self.begin()
+
+    def stop(self):
+        self.enabled = False
+        self.close()
+
+    def begin(self):
+        # start a frame, counters are read as the change since here
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.updates = 0
+        self.collision = getattr(self.game, 'collision', None)
+        self.queries = self.collision.queries if self.collision is not None else 0
+        self.surfaces = self.surface_count()
+        self.mark = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.times[phase] += now - self.mark
+        self.mark = now
+
+    def end(self):
+        game = self.game
+        collision = getattr(game, 'collision', None)
+        queries = 0
+        if collision is not None:
+            queries = collision.queries - (self.queries if collision is self.collision else 0)
+
+        record = {'frame': self.frames, 'ticks': round(game.ticks, 1), 'updates': self.updates}
+        for phase in PHASES:
+            record[phase] = round(self.times[phase] * 1000, 3)
+        record['total'] = round(sum(self.times.values()) * 1000, 3)
+        for field, group in GROUPS.items():
+            sprites = getattr(game, group, None)
+            record[field] = len(sprites) if sprites is not None else 0
+        camera = getattr(game, 'camera', None)
+        record['culled'] = camera.culled if camera is not None else 0
+        record['collisions'] = queries
+        record['surfaces'] = self.surface_count() - self.surfaces
+
+        self.history.append(record)
+        self.write(record)
+        self.frames += 1
+        self.begin()
+
+    def surface_count(self):
+        # cache misses that created a surface, tile chunks baked and art scaled
+        count = ASSETS.misses + TEXT_CACHE.misses + SCALED_SURFACES.misses
+        tile_layer = getattr(self.game, 'tile_layer', None)
+        if tile_layer is not None:
+            count += tile_layer.bakes
+        return count + getattr(self.game.renderer, 'misses', 0)
+
+    def write(self, record):
+        # a .csv log gets a header and a row per frame, anything else a json line
+        if self.log_path is None:
+            return
+        if self.log is None or self.lines >= self.log_lines:
+            self.rotate(record)
+        if self.writer is not None:
+            self.writer.writerow(record)
+        else:
+            self.log.write(json.dumps(record) + '\n')
+        self.lines += 1
+
+    def rotate(self, record):
+        # keep the current log and the one before it
+        if self.log is not None:
+            self.log.close()
+            os.replace(self.log_path, self.log_path + '.1')
+        self.log = open(self.log_path, 'w', newline='')
+        self.lines = 0
+        self.writer = None
+        if self.log_path.endswith('.csv'):
+            self.writer = csv.DictWriter(self.log, fieldnames=list(record))
+            self.writer.writeheader()
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+            self.writer = None
+
+    def averages(self):
+        count = len(self.history)
+        if not count:
+            return {}
+        return {key: sum(record[key] for record in self.history) / count for key in self.history[-1]}
+
+    def draw(self, surface, offset=(0, 0), dirty=None):
+        # under the lives counter, refreshed a few times a second so the
+        # overlay doesn't render new text every frame
+        scale = self.game.scale_factor
+        if self.font is None or self.font_scale != scale:
+            self.font = FONTS.get(MAIN_FONT, max(8, int(PROFILE_FONT_SIZE * scale)))
+            self.font_scale = scale
+            self.overlay = []
+
+        if not self.overlay or self.frames - self.overlay_frame >= PROFILE_REFRESH:
+            self.overlay_frame = self.frames
+            average = self.averages()
+            if average:
+                lines = [
+                    f"frame {average['total']:.2f} ms  updates {average['updates']:.1f}",
+                    '  '.join(f"{phase} {average[phase]:.2f}" for phase in PHASES),
+                    f"sprites {average['all_sprites']:.0f}  enemies {average['enemy_sprites']:.0f}  culled {average['culled']:.0f}",
+                    f"collisions {average['collisions']:.0f}  surfaces {average['surfaces']:.2f}",
+                ]
+            else:
+                lines = ['profiling']
+            self.overlay = [self.font.render(line, True, PROFILE_COLOR) for line in lines]
+
+        x = int(10 * scale) + offset[0]
+        y = int(50 * scale) + offset[1]
+        for text in self.overlay:
+            rect = surface.blit(text, (x, y))
+            if dirty is not None:
+                dirty.mark(text, rect, text)
+            y += text.get_height()
@@ -0,0 +1,248 @@
+import math
+import pygame
+from config import *
+from resources import ASSETS
+
+class TileLayer:
+    def __init__(self, level, scope='level', background=LIGHT_BLUE):
+        self.level = level
+        self.scope = scope
+        self.background = background
+
+        self.rows = level.height
+        self.columns = level.width
+        self.chunk_width = CHUNK_WIDTH * TILESIZE
+        self.chunk_height = CHUNK_HEIGHT * TILESIZE
+
+        # chunks are baked when they first come into view
+        self.chunks = {}
+        self.bakes = 0
+        self.chunk_columns = math.ceil(self.columns / CHUNK_WIDTH)
+        self.chunk_rows = math.ceil(self.rows / CHUNK_HEIGHT)
+
+    def bake(self, first_column, first_row):
+        last_column = min(first_column + CHUNK_WIDTH, self.columns)
+        last_row = min(first_row + CHUNK_HEIGHT, self.rows)
+
+        surface = pygame.Surface(((last_column - first_column) * TILESIZE,
+                                  (last_row - first_row) * TILESIZE)).convert()
+        surface.fill(self.background)
+        self.bakes += 1
+
+        # row by row, the same order the blocks were created and drawn in
+        for j, i, column in self.level.tiles_in(first_column, first_row, last_column, last_row):
+            sprite = TILE_SPRITES.get(column)
+            if sprite is not None:
+                tile = ASSETS.image(sprite, (TILESIZE, TILESIZE), scope=self.scope)
+                surface.blit(tile, ((j - first_column) * TILESIZE, (i - first_row) * TILESIZE))
+        return surface
+
+    def visible_chunks(self, camera, offset):
+        # chunk indices overlapping the camera view
+        left = -offset[0]
+        top = -offset[1]
+        first_x = max(0, left // self.chunk_width)
+        last_x = (left + camera.width - 1) // self.chunk_width
+        first_y = max(0, top // self.chunk_height)
+        last_y = (top + camera.height - 1) // self.chunk_height
+        for cy in range(first_y, min(last_y + 1, self.chunk_rows)):
+            for cx in range(first_x, min(last_x + 1, self.chunk_columns)):
+                yield cx, cy
+
+    def chunk(self, key):
+        surface = self.chunks.get(key)
+        if surface is None:
+            surface = self.chunks[key] = self.bake(key[0] * CHUNK_WIDTH, key[1] * CHUNK_HEIGHT)
+        return surface
+
+    def unload(self, key):
+        self.chunks.pop(key, None)
+
+    def draw(self, surface, camera, alpha=1):
+        offset_x, offset_y = camera.offset(alpha)
+        offset_x = round(offset_x)
+        offset_y = round(offset_y)
+        for cx, cy in self.visible_chunks(camera, (offset_x, offset_y)):
+            surface.blit(self.chunk((cx, cy)),
+                         (cx * self.chunk_width + offset_x, cy * self.chunk_height + offset_y))
+
+
+class SurfaceRenderer:
+    # draws the world at WIN_WIDTH x WIN_HEIGHT, then scales the frame to the window
+    def __init__(self):
+        self.predraw_surface = pygame.Surface((WIN_WIDTH, WIN_HEIGHT)).convert()
+        self.scaled_surface = None
+
+    def clear(self):
+        # nothing is kept per level
+        pass
+
+    def fit_scale(self, width, height):
+        return min(width / WIN_WIDTH, height / WIN_HEIGHT)
+
+    def draw(self, screen, scale_factor, tile_layer, camera, actors, alpha=1, dirty=None):
+        predraw_surface = self.predraw_surface
+        predraw_surface.fill(LIGHT_BLUE)
+
+        adj_width = int(WIN_WIDTH * scale_factor)
+        adj_height = int(WIN_HEIGHT * scale_factor)
+
+        x_pad = (screen.get_width() - adj_width) // 2
+        y_pad = (screen.get_height() - adj_height) // 2
+
+        offset_x, offset_y = camera.offset(alpha)
+        tile_layer.draw(predraw_surface, camera, alpha)
+        scale_x = adj_width / WIN_WIDTH
+        scale_y = adj_height / WIN_HEIGHT
+        for sprite in camera.visible(actors):
+            x, y = sprite.interpolate(alpha)
+            position = predraw_surface.blit(sprite.image, (round(x + offset_x), round(y + offset_y)))
+            if dirty is not None:
+                # where the scaled frame puts it, a pixel wider for rounding
+                left = x_pad + int(position.left * scale_x) - 1
+                top = y_pad + int(position.top * scale_y) - 1
+                dirty.mark(sprite, pygame.Rect(left, top,
+                                               x_pad + math.ceil(position.right * scale_x) + 1 - left,
+                                               y_pad + math.ceil(position.bottom * scale_y) + 1 - top),
+                           sprite.image)
+
+        if (adj_width, adj_height) == predraw_surface.get_size():
+            frame = predraw_surface
+        else:
+            # scale into the same surface every frame until the window size changes
+            if self.scaled_surface is None or self.scaled_surface.get_size() != (adj_width, adj_height):
+                self.scaled_surface = pygame.Surface((adj_width, adj_height)).convert()
+            frame = pygame.transform.scale(predraw_surface, (adj_width, adj_height), self.scaled_surface)
+
+        screen.fill(BLACK)
+        screen.blit(frame, (x_pad, y_pad))
+        return x_pad, y_pad
+
+
+class DirectRenderer:
+    # scales the tile and sprite art once per scale factor and draws straight to the window
+    def __init__(self, integer_scale=False):
+        self.integer_scale = integer_scale
+        self.scale = None
+        self.images = {}
+        self.misses = 0
+
+    def fit_scale(self, width, height):
+        scale_factor = min(width / WIN_WIDTH, height / WIN_HEIGHT)
+        if self.integer_scale:
+            # whole pixel multiples, every tile lines up exactly
+            return max(1, int(scale_factor))
+        return scale_factor
+
+    def set_scale(self, scale_factor):
+        if scale_factor != self.scale:
+            self.scale = scale_factor
+            self.images.clear()
+
+    def clear(self):
+        # keyed by surface, the art a level loads is new surfaces every time
+        self.images.clear()
+
+    def scaled(self, image, size):
+        key = (image, size)
+        scaled = self.images.get(key)
+        if scaled is None:
+            self.misses += 1
+            scaled = self.images[key] = pygame.transform.scale(image, size)
+        return scaled
+
+    def draw(self, screen, scale_factor, tile_layer, camera, actors, alpha=1, dirty=None):
+        self.set_scale(scale_factor)
+        scale = scale_factor
+
+        adj_width = int(WIN_WIDTH * scale)
+        adj_height = int(WIN_HEIGHT * scale)
+
+        x_pad = (screen.get_width() - adj_width) // 2
+        y_pad = (screen.get_height() - adj_height) // 2
+
+        screen.fill(BLACK)
+        viewport = pygame.Rect(x_pad, y_pad, adj_width, adj_height)
+        screen.fill(LIGHT_BLUE, viewport)
+        screen.set_clip(viewport)
+
+        offset_x, offset_y = camera.offset(alpha)
+        origin_x = round(offset_x * scale) + x_pad
+        origin_y = round(offset_y * scale) + y_pad
+
+        # tiles are rounded up a pixel so fractional scales leave no seams
+        tile_size = math.ceil(TILESIZE * scale)
+        first_column = max(0, int(-offset_x) // TILESIZE)
+        first_row = max(0, int(-offset_y) // TILESIZE)
+        last_column = (int(-offset_x) + WIN_WIDTH) // TILESIZE
+        last_row = (int(-offset_y) + WIN_HEIGHT) // TILESIZE
+        for j, i, column in tile_layer.level.tiles_in(first_column, first_row, last_column + 1, last_row + 1):
+            sprite = TILE_SPRITES.get(column)
+            if sprite is not None:
+                tile = ASSETS.image(sprite, (TILESIZE, TILESIZE), scope=tile_layer.scope)
+                screen.blit(self.scaled(tile, (tile_size, tile_size)),
+                            (origin_x + round(j * TILESIZE * scale), origin_y + round(i * TILESIZE * scale)))
+
+        for sprite in camera.visible(actors):
+            x, y = sprite.interpolate(alpha)
+            image = sprite.image
+            size = (round(image.get_width() * scale), round(image.get_height() * scale))
+            position = screen.blit(self.scaled(image, size),
+                                   (round((x + offset_x) * scale) + x_pad, round((y + offset_y) * scale) + y_pad))
+            if dirty is not None:
+                dirty.mark(sprite, position, image)
+
+        screen.set_clip(None)
+        return x_pad, y_pad
+
+
+# the window lost what was pushed to it and has to be pushed again whole
+REPAINT_EVENTS = (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED, pygame.WINDOWSHOWN, pygame.WINDOWRESTORED)
+
+
+class DirtyRects:
+    # screen areas that changed since the last display update. Whatever is
+    # drawn gets marked with what it showed, and only the areas where that
+    # moved, changed or went away are pushed to the window. A new view, the
+    # camera moving, a resize, another level or the window being uncovered,
+    # pushes the whole window
+    def __init__(self, enabled=DIRTY_RECTS):
+        self.enabled = enabled
+        self.view = None
+        self.full = True
+        self.drawn = {}
+        self.marks = {}
+
+    def begin(self, view):
+        if not self.enabled or view != self.view:
+            self.view = view
+            self.full = True
+        self.marks = {}
+
+    def invalidate(self):
+        self.full = True
+
+    def mark(self, key, rect, content):
+        self.marks[key] = (rect, content)
+
+    def update(self):
+        if self.full:
+            pygame.display.update()
+        else:
+            rects = []
+            drawn = self.drawn
+            for key, (rect, content) in self.marks.items():
+                previous = drawn.pop(key, None)
+                if previous is None:
+                    rects.append(rect)
+                elif previous[0] != rect or previous[1] != content:
+                    rects.append(previous[0])
+                    rects.append(rect)
+            # whatever wasn't drawn again has to be cleared off the window
+            rects.extend(rect for rect, content in drawn.values())
+            if rects:
+                pygame.display.update(rects)
+
+        self.drawn = self.marks
+        self.marks = {}
+        self.full = False
@@ -0,0 +1,178 @@
+import json
+import struct
+import sys
+import time
+from config import *
+from inputs import GAME_KEYS, RecordingInput, ReplayInput
+from physics import FIELDS as PHYSICS, PhysicsParams
+
+# replay file layout:
+#   header   magic, version, tick rate, start level, key count, run count, start ticks
+#   physics  the slider values the run was played with
+#   keys     pygame key code for each bit of the key masks
+#   runs     tick count and key mask for every run of unchanged keys
+MAGIC = b'DRPL'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHHId')
+PHYSICS_VALUES = struct.Struct('<' + 'd' * len(PHYSICS))
+KEY = struct.Struct('<I')
+RUN = struct.Struct('<IB')
+REPLAY_SUFFIX = '.rpl'
+
+
+class Replay:
+    def __init__(self, runs, keys=GAME_KEYS, level=0, start_ticks=0.0, physics=None, tick_rate=TICK_RATE):
+        self.runs = runs
+        self.keys = keys
+        self.level = level
+        self.start_ticks = start_ticks
+        self.physics = physics if physics is not None else PhysicsParams().as_dict()
+        self.tick_rate = tick_rate
+
+    @property
+    def ticks(self):
+        return sum(count for count, mask in self.runs)
+
+
+class Recorder:
+    # records a game from its start, game.input is wrapped while it runs
+    def __init__(self, game):
+        self.game = game
+        self.input = RecordingInput(game.input)
+        game.input = self.input
+        self.start()
+
+    def start(self):
+        # call once the game or level has been set up, before its first update
+        self.input.reset()
+        self.level = self.game.level_index
+        self.start_ticks = self.game.ticks
+        self.physics = self.game.physics.as_dict()
+
+    def replay(self):
+        return Replay([list(run) for run in self.input.runs], self.input.keys, self.level,
+                      self.start_ticks, self.physics)
+
+    def save(self, file_path):
+        write_replay(self.replay(), file_path)
+        return file_path
+
+
+def write_replay(replay, file_path):
+    with open(file_path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, replay.tick_rate, replay.level, len(replay.keys),
+                               len(replay.runs), replay.start_ticks))
+        file.write(PHYSICS_VALUES.pack(*(replay.physics[name] for name in PHYSICS)))
+        for key in replay.keys:
+            file.write(KEY.pack(key))
+        for count, mask in replay.runs:
+            file.write(RUN.pack(count, mask))
+
+
+def read_replay(file_path):
+    with open(file_path, 'rb') as file:
+        data = file.read()
+
+    magic, version, tick_rate, level, key_count, run_count, start_ticks = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{file_path} is not a replay")
+
+    offset = HEADER.size
+    physics = dict(zip(PHYSICS, PHYSICS_VALUES.unpack_from(data, offset)))
+    offset += PHYSICS_VALUES.size
+    keys = tuple(KEY.unpack_from(data, offset + i * KEY.size)[0] for i in range(key_count))
+    offset += key_count * KEY.size
+    runs = [list(RUN.unpack_from(data, offset + i * RUN.size)) for i in range(run_count)]
+
+    return Replay(runs, keys, level, start_ticks, physics, tick_rate)
+
+
+def player_state(game):
+    player = game.player.sprites()[0]
+    return (game.level_index, player.rect.x, player.rect.y, player.x_change, player.y_change)
+
+
+def play(replay, game=None, render=False, trajectory=False, physics=None):
+    # feeds the replay through the headless update loop as fast as it will go,
+    # physics overrides the values it was recorded with
+    import main
+
+    if replay.tick_rate != TICK_RATE:
+        raise ValueError(f"replay was recorded at {replay.tick_rate} ticks per second, not {TICK_RATE}")
+
+    if game is None:
+        game = main.Game(headless=True)
+    saved = game.physics
+    game.physics = PhysicsParams(**dict(replay.physics, **(physics or {})))
+    try:
+        game.ticks = replay.start_ticks
+        game.new()
+        if replay.level:
+            game.level_index = replay.level
+            game.reset_level()
+        game.input = ReplayInput(replay.runs, replay.keys)
+
+        states = []
+        ticks = replay.ticks
+        tick = 0
+        start = time.perf_counter()
+        while game.playing and tick < ticks:
+            game.events()
+            game.update()
+            if render:
+                game.draw()
+            if trajectory and game.playing:
+                states.append(player_state(game))
+            tick += 1
+        seconds = time.perf_counter() - start
+    finally:
+        game.physics = saved
+
+    return {
+        'ticks': tick,
+        'seconds': seconds,
+        'ticks_per_second': tick / seconds if seconds else 0,
+        'level': game.level_index,
+        'score': game.score.score_val,
+        'lives': game.lives.lives,
+        'playing': game.playing,
+        'win': game.win,
+        'trajectory': states,
+    }
+
+
+def compare_trajectory(golden, states):
+    # first tick where the player differs from the golden run, None if none
+    for tick, (expected, actual) in enumerate(zip(golden, states)):
+        if list(expected) != list(actual):
+            return tick
+    if len(golden) != len(states):
+        return min(len(golden), len(states))
+    return None
+
+
+if __name__ == '__main__':
+    # python replay.py run.rpl [--render] [--golden run.json [--write]]
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Play a recorded run back headless.')
+    parser.add_argument('replay')
+    parser.add_argument('--render', action='store_true', help='draw every tick as well')
+    parser.add_argument('--golden', help='player trajectory to check the run against')
+    parser.add_argument('--write', action='store_true', help='write the trajectory to --golden instead')
+    args = parser.parse_args()
+
+    result = play(read_replay(args.replay), render=args.render, trajectory=args.golden is not None)
+    print(f"{result['ticks']} ticks in {result['seconds']:.3f}s, {result['ticks_per_second']:.0f} ticks/s, "
+          f"level {result['level']} score {result['score']} lives {result['lives']}")
+
+    if args.golden and args.write:
+        with open(args.golden, 'w') as file:
+            json.dump(result['trajectory'], file)
+    elif args.golden:
+        with open(args.golden) as file:
+            tick = compare_trajectory(json.load(file), result['trajectory'])
+        if tick is not None:
+            print(f"trajectory differs from {args.golden} at tick {tick}")
+            sys.exit(1)
+        print(f"trajectory matches {args.golden}")
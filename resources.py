@@ -0,0 +1,230 @@
+import pygame
+import threading
+from collections import OrderedDict
+from config import *
+
+class SpriteSheet():
+    def __init__(self, image):
+        self.sheet = image
+
+    #animate spritesheet
+    def get_image(self, frame, width, height):
+        image = pygame.Surface((width, height), pygame.SRCALPHA).convert_alpha()
+        image.blit(self.sheet, (0, 0), ((frame * width), 0, width, height))
+        return image
+
+
+class AssetCache:
+    # games running side by side share it, so the scope is part of the key
+    # and one game evicting its level art leaves the other games' copies
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key, loader, scope):
+        key = (scope,) + key
+        with self.lock:
+            asset = self.entries.get(key)
+            if asset is not None:
+                self.hits += 1
+                return asset
+            self.misses += 1
+
+        # loaded outside the lock, frames loads its sheet through here too
+        asset = loader()
+        with self.lock:
+            return self.entries.setdefault(key, asset)
+
+    def image(self, path, size=None, scope='global'):
+        # size crops the image onto a transparent surface of that size
+        def load():
+            image = pygame.image.load(resource_path(path)).convert_alpha()
+            if size is None:
+                return image
+            cropped = pygame.Surface(size, pygame.SRCALPHA)
+            cropped.blit(image, (0, 0))
+            return cropped
+
+        return self._get(('image', path, size), load, scope)
+
+    def frames(self, path, animation_steps, width, height, flip=False, scope='global'):
+        # one list of frames per animation, sliced left to right from the sheet
+        def load():
+            if flip:
+                return [[pygame.transform.flip(image, True, False) for image in animation]
+                        for animation in self.frames(path, animation_steps, width, height, scope=scope)]
+
+            sprite_sheet = SpriteSheet(self.image(path, scope=scope))
+            animation_list = []
+            step_counter = 0
+            for animation in animation_steps:
+                temp_image_list = []
+                for _ in range(animation):
+                    temp_image_list.append(sprite_sheet.get_image(step_counter, width, height))
+                    step_counter += 1
+                animation_list.append(temp_image_list)
+            return animation_list
+
+        key = ('frames', path, tuple(animation_steps), width, height, flip)
+        return self._get(key, load, scope)
+
+    def sound(self, path, volume=None, scope='global'):
+        def load():
+            if not pygame.mixer.get_init():
+                pygame.mixer.init()
+            sound = pygame.mixer.Sound(resource_path(path))
+            if volume is not None:
+                sound.set_volume(volume)
+            return sound
+
+        return self._get(('sound', path, volume), load, scope)
+
+    def evict(self, scope):
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == scope]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class TextCache:
+    def __init__(self, max_size=TEXT_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        # fonts are keyed by object, a rescaled font renders fresh surfaces
+        key = (font, text, color, antialias)
+        entries = self.entries
+        surface = entries.get(key)
+        if surface is not None:
+            entries.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = entries[key] = font.render(text, antialias, color)
+        if len(entries) > self.max_size:
+            entries.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
+
+
+class FontPool:
+    def __init__(self, max_size=FONT_POOL_SIZE):
+        self.max_size = max_size
+        self.fonts = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, size):
+        # path None is pygame's default font
+        key = (path, size)
+        fonts = self.fonts
+        font = fonts.get(key)
+        if font is not None:
+            fonts.move_to_end(key)
+            self.hits += 1
+            return font
+
+        self.misses += 1
+        font = fonts[key] = pygame.font.Font(None if path is None else resource_path(path), size)
+        # resizing the window walks through many sizes, keep only the recent ones
+        if len(fonts) > self.max_size:
+            fonts.popitem(last=False)
+        return font
+
+    def clear(self):
+        self.fonts.clear()
+
+    def stats(self):
+        return {'entries': len(self.fonts), 'hits': self.hits, 'misses': self.misses}
+
+
+def fit_size(window_size):
+    # largest WIN_WIDTH x WIN_HEIGHT area that fits the window
+    scale_factor = min(window_size[0] / WIN_WIDTH, window_size[1] / WIN_HEIGHT)
+    return int(WIN_WIDTH * scale_factor), int(WIN_HEIGHT * scale_factor)
+
+
+class ScaledSurfaceCache:
+    def __init__(self, max_size=SCALED_CACHE_SIZE):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, source, size):
+        key = (source, size)
+        with self.lock:
+            surface = self.surfaces.get(key)
+            if surface is not None:
+                self.surfaces.move_to_end(key)
+                self.hits += 1
+                return surface
+            self.misses += 1
+
+        surface = pygame.transform.scale(source, size)
+        self.store(key, surface)
+        return surface
+
+    def store(self, key, surface):
+        with self.lock:
+            self.surfaces[key] = surface
+            self.surfaces.move_to_end(key)
+            if len(self.surfaces) > self.max_size:
+                self.surfaces.popitem(last=False)
+
+    def prescale(self, sources, window_sizes):
+        # fill the cache for common window sizes without blocking startup
+        def work():
+            for window_size in window_sizes:
+                size = fit_size(window_size)
+                for source in sources:
+                    with self.lock:
+                        if (source, size) in self.surfaces:
+                            continue
+                    self.store((source, size), pygame.transform.scale(source, size))
+
+        thread = threading.Thread(target=work, daemon=True)
+        thread.start()
+        return thread
+
+    def clear(self):
+        with self.lock:
+            self.surfaces.clear()
+
+    def stats(self):
+        return {'entries': len(self.surfaces), 'hits': self.hits, 'misses': self.misses}
+
+
+# process-wide registry shared by every sprite
+ASSETS = AssetCache()
+
+# shared fonts for every text widget
+FONTS = FontPool()
+
+# menu backgrounds scaled to the current window
+SCALED_SURFACES = ScaledSurfaceCache()
+
+# rendered labels shared by the HUD widgets
+TEXT_CACHE = TextCache()
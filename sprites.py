@@ -1,53 +1,45 @@
 import pygame
-import config
 from config import *
 import math
 import random
 import time
-from parents import AnimatedSprite, SpriteSheet, Block, DisplayText
+from parents import AnimatedSprite, DisplayText
+from resources import ASSETS
 
 class Player(AnimatedSprite):
+    __slots__ = ('dead', 'jump_sound', 'enemy_bounce')
+
     def __init__(self, game, x, y):
-        self.game = game
         self._layer = PLAYER_LAYER
 
-        super().__init__(x, y, self.game.all_sprites, self.game.player)
+        super().__init__(game, x, y, game.all_sprites, game.actors, game.player)
 
         self.width = PLAYER_WIDTH
         self.height = PLAYER_HEIGHT
 
-        player_sprite = pygame.image.load(resource_path(SPRITE_PLAYER)).convert_alpha()
-        sprite_sheet = SpriteSheet(player_sprite)
-
         animation_steps = [5, 5, 5, 1, 8]
-
-        step_counter = 0
-
-        for animation in animation_steps:
-            temp_image_list = []
-            for _ in range(animation):
-                temp_image_list.append(sprite_sheet.get_image(step_counter, 32, 32))
-                step_counter += 1
-            self.animation_list.append(temp_image_list)
+        self.animation_list = ASSETS.frames(SPRITE_PLAYER, animation_steps, 32, 32, scope=game.asset_scope)
+        # the sheet faces right
+        self.flipped_list = ASSETS.frames(SPRITE_PLAYER, animation_steps, 32, 32, flip=True, scope=game.asset_scope)
 
         #load player sprite
-        self.image = pygame.Surface([self.width, self.height], pygame.SRCALPHA)
-        self.image.blit(self.animation_list[self.action_state][self.frame], (0, 0))
+        self.image = self.animation_list[self.action_state][self.frame]
 
         self.rect = self.image.get_rect()
         self.rect.x = self.x
         self.rect.y = self.y
+        self.previous = self.rect.topleft
 
         self.dead = False
 
-        pygame.mixer.init()
-        self.jump_sound = pygame.mixer.Sound(resource_path(SOUND_JUMP))
-        self.jump_sound.set_volume(VOL_JUMP)
-        self.enemy_bounce = pygame.mixer.Sound(resource_path(SOUND_BOUNCE))
-        self.enemy_bounce.set_volume(VOL_BOUNCE)
+        self.jump_sound = ASSETS.sound(SOUND_JUMP, VOL_JUMP)
+        self.enemy_bounce = ASSETS.sound(SOUND_BOUNCE, VOL_BOUNCE)
 
     def update(self):
-        self.movement()
+        self.previous = self.rect.topleft
+        physics = self.game.physics
+
+        self.movement(physics)
         self.animate()
 
         self.rect.x += self.x_change
@@ -57,11 +49,11 @@ class Player(AnimatedSprite):
 
         self.check_if_falling()
 
-        self.apply_gravity()
-        self.apply_friction()
+        self.apply_gravity(physics)
+        self.apply_friction(physics)
 
-    def movement(self):
-        keys = pygame.key.get_pressed()
+    def movement(self, physics):
+        keys = self.game.keys
         moving = keys[pygame.K_LEFT] or keys[pygame.K_RIGHT] or \
                 keys[pygame.K_d] or keys[pygame.K_e] or keys[pygame.K_UP] or \
                 (self.x_change != 0 and not self.action_state == PLAYER_JUMP)
@@ -74,13 +66,13 @@ class Player(AnimatedSprite):
             self.jump_sound.play()
 
         elif keys[pygame.K_RIGHT]:
-            self.facing = 'right'
-            self.x_change += self.accelerate(1)
+            self.facing = MOVE_RIGHT
+            self.x_change += self.accelerate(1, physics)
             if not self.action_state == PLAYER_JUMP or self.grounded:
                 new_state = PLAYER_RUN
         elif keys[pygame.K_LEFT]:
-            self.facing = 'left'
-            self.x_change -= self.accelerate(-1)
+            self.facing = MOVE_LEFT
+            self.x_change -= self.accelerate(-1, physics)
             if not self.action_state == PLAYER_JUMP or self.grounded:
                 new_state = PLAYER_RUN
 
@@ -99,56 +91,57 @@ class Player(AnimatedSprite):
             self.set_action_state(new_state)
 
         # cap player speed
-        if self.x_change > config.PLAYER_MAX_SPEED:
-            self.x_change = config.PLAYER_MAX_SPEED
-        elif self.x_change < -config.PLAYER_MAX_SPEED:
-            self.x_change = -config.PLAYER_MAX_SPEED
+        max_speed = physics.player_max_speed
+        if self.x_change > max_speed:
+            self.x_change = max_speed
+        elif self.x_change < -max_speed:
+            self.x_change = -max_speed
 
         # short hop
         if not keys[pygame.K_UP] and self.y_change < 0:
             self.y_change *= SHORT_HOP_MOD
 
-    def accelerate(self, direction):
+    def accelerate(self, direction, physics):
         if self.x_change * direction >= 0:
             if self.grounded:
-                return config.PLAYER_SPEED
+                return physics.player_speed
             else:
-                return config.PLAYER_SPEED * AIR_MOD
+                return physics.air_speed
 
-        normalized_speed = abs(self.x_change) / config.PLAYER_MAX_SPEED
-        acceleration = config.PLAYER_SPEED * (1 - normalized_speed ** 0.5)
+        normalized_speed = abs(self.x_change) / physics.player_max_speed
+        acceleration = physics.player_speed * (1 - normalized_speed ** 0.5)
         if self.grounded:
-            return config.PLAYER_SPEED
+            return physics.player_speed
         else:
-            return config.PLAYER_SPEED * AIR_MOD
+            return physics.air_speed
 
-    def apply_friction(self):
-        keys = pygame.key.get_pressed()
+    def apply_friction(self, physics):
+        keys = self.game.keys
         if keys[pygame.K_RIGHT] or keys[pygame.K_LEFT]:
             return
         if self.x_change > 0 and self.grounded:
-            self.x_change -= config.FRICTION
+            self.x_change -= physics.friction
             if self.x_change < 0:
                 self.x_change = 0
         elif self.x_change > 0 and not self.grounded:
-            self.x_change -= config.FRICTION * config.AIR_RESISTANCE
+            self.x_change -= physics.air_friction
             if self.x_change < 0:
                 self.x_change = 0
         elif self.x_change < 0 and self.grounded:
-            self.x_change += config.FRICTION
+            self.x_change += physics.friction
             if self.x_change > 0:
                 self.x_change = 0
         elif self.x_change < 0 and not self.grounded:
-            self.x_change += config.FRICTION * config.AIR_RESISTANCE
+            self.x_change += physics.air_friction
             if self.x_change > 0:
                 self.x_change = 0
 
-    def apply_gravity(self):
+    def apply_gravity(self, physics):
         if not self.grounded:
             if self.y_change > 0:
-                self.y_change += config.GRAVITY * FAST_FALL_MOD
+                self.y_change += physics.fall_gravity
             else:
-                self.y_change += config.GRAVITY
+                self.y_change += physics.gravity
         else:
             self.y_change = 0
 
@@ -163,11 +156,11 @@ class Player(AnimatedSprite):
                     if hit.action_state != ENEMY_SMUSH:
                         hit.action_state = ENEMY_SMUSH
                         hit.animation_rate = ENEMY_DIE_SPEED
-                        hit.move_state = 'stop'
+                        hit.move_state = MOVE_STOP
                         hit.frame = 0
-                        hit.last_update = pygame.time.get_ticks()
+                        hit.last_update = self.game.ticks
 
-                        keys = pygame.key.get_pressed()
+                        keys = self.game.keys
                         if keys[pygame.K_UP]:
                             self.y_change = PLAYER_BOUNCE_SPEED
                         else:
@@ -191,10 +184,21 @@ class Player(AnimatedSprite):
             self.die()
 
         # game win
-        if pygame.sprite.spritecollide(self, self.game.flag, False):
+        if self.touching_tile(FLAG_TILE):
             self.game.score.increase_score(LEVEL_WIN_POINTS)
             self.game.next_level()
 
+    def touching_tile(self, char):
+        # read straight from the level grid, tiles are not sprites
+        level = self.game.level
+        code = ord(char)
+        rect = self.rect
+        for y in range(rect.top // TILESIZE, (rect.bottom - 1) // TILESIZE + 1):
+            for x in range(rect.left // TILESIZE, (rect.right - 1) // TILESIZE + 1):
+                if level.tile(x, y) == code:
+                    return True
+        return False
+
     def die(self):
         self.action_state = PLAYER_DEATH
         self.frame = 0
@@ -204,60 +208,39 @@ class Player(AnimatedSprite):
         self.game.lives.lose_life()
 
 
-class Block1(Block):
-    def __init__(self, game, x, y):
-        super().__init__(game, x, y, SPRITE_BRICK_1, game.all_sprites, game.blocks)
-
-
-class Block2(Block):
-    def __init__(self, game, x, y):
-        super().__init__(game, x, y, SPRITE_BRICK_2, game.all_sprites, game.blocks)
-
-
-class Flag(Block):
-    def __init__(self, game, x, y):
-        super().__init__(game, x, y, SPRITE_FLAG, game.all_sprites, game.flag)
-
-
 class Enemy(AnimatedSprite):
+    __slots__ = ('wasOnScreen',)
+
     def __init__(self, game, x, y):
-        self.game = game
         self._layer = ENEMY_LAYER
-        super().__init__(x, y, self.game.all_sprites, self.game.enemy)
+        super().__init__(game, x, y, game.all_sprites, game.actors, game.enemy)
 
         self.width = ENEMY_WIDTH
         self.height = ENEMY_HEIGHT
 
         self.wasOnScreen = False
 
-        enemy_sprite = pygame.image.load(resource_path(SPRITE_ENEMY_1)).convert_alpha()
-        sprite_sheet = SpriteSheet(enemy_sprite)
-
         animation_steps = [4, 5]
+        self.animation_list = ASSETS.frames(SPRITE_ENEMY_1, animation_steps, self.width, self.height, scope=game.asset_scope)
 
         self.action_state = ENEMY_WALK
 
-        step_counter = 0
-
-        for animation in animation_steps:
-            temp_image_list = []
-            for _ in range(animation):
-                temp_image_list.append(sprite_sheet.get_image(step_counter, self.width, self.height))
-                step_counter += 1
-            self.animation_list.append(temp_image_list)
-
         #load enemy sprite
-        self.image = pygame.Surface([self.width, self.height], pygame.SRCALPHA)
-        self.image.blit(self.animation_list[self.action_state][self.frame], (0, 0))
+        self.image = self.animation_list[self.action_state][self.frame]
 
         self.rect = self.image.get_rect()
         self.rect.x = self.x
         self.rect.y = self.y
+        self.previous = self.rect.topleft
+
+        if game.enemy_batch is not None:
+            game.enemy_batch.add(self)
 
 
     def update(self):
         if self.is_on_screen or self.wasOnScreen:
             self.wasOnScreen = True
+            self.previous = self.rect.topleft
             self.movement()
             self.animate()
 
@@ -274,23 +257,38 @@ class Enemy(AnimatedSprite):
 
             #enemy gravity
             if not self.grounded:
-                self.y_change += config.GRAVITY
+                self.y_change += self.game.physics.gravity
             else:
                 self.y_change = 0
 
 
     @property
     def is_on_screen(self):
-        return self.rect.colliderect(self.game.camera.get_world_rect())
+        return self.rect.colliderect(self.game.camera.world_rect)
 
 
     def movement(self):
-        if self.move_state == 'left':
-            self.x_change = -1
-        elif self.move_state == 'right':
-            self.x_change = 1
-        else:
-            self.x_change = 0
-
-
-
+        # the direction is the walking speed
+        self.x_change = self.move_state
+
+    def kill(self):
+        if self.game.enemy_batch is not None:
+            self.game.enemy_batch.remove(self)
+        super().kill()
+
+    def get_state(self):
+        # everything needed to bring the enemy back after its chunk unloads
+        if self.game.enemy_batch is not None:
+            self.game.enemy_batch.sync(self)
+        return (self.rect.x, self.rect.y, self.x_change, self.y_change, self.move_state,
+                self.action_state, self.frame, self.last_update, self.animation_rate,
+                self.grounded, self.wasOnScreen)
+
+    def set_state(self, state):
+        (self.rect.x, self.rect.y, self.x_change, self.y_change, self.move_state,
+         self.action_state, self.frame, self.last_update, self.animation_rate,
+         self.grounded, self.wasOnScreen) = state
+        self.previous = self.rect.topleft
+        self.image = self.animation_list[self.action_state][self.frame]
+        if self.game.enemy_batch is not None:
+            self.game.enemy_batch.pull(self)
@@ -0,0 +1,136 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from config import *
+from physics import FIELDS as PHYSICS, PhysicsParams
+from replay import read_replay, play
+
+# workers run the game headless, they inherit these before pygame starts
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+# python sweep.py --gravity .3 .4 .5 --player-max-speed 4 5 6 [--replay run.rpl]
+OPTIONS = {name: '--' + name.replace('_', '-') for name in PHYSICS}
+MAX_TICKS = 20000
+COLUMNS = PHYSICS + ('completed', 'level', 'seconds', 'score', 'deaths')
+
+# one game per worker process, reused for every run it is given
+worker_game = None
+worker_replays = {}
+
+
+def grid(values):
+    # every combination of the values given for each setting
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*values.values())]
+
+
+def runner_keys(game):
+    # run right, jump at enemies ahead and at anything that stops the player
+    import pygame
+
+    player = game.player.sprites()[0]
+    rect = player.rect
+    ahead = any(0 < enemy.rect.x - rect.x < 70 and abs(enemy.rect.y - rect.y) < 40 for enemy in game.enemy)
+    if ahead or (player.x_change == 0 and player.grounded):
+        return {pygame.K_RIGHT, pygame.K_UP}
+    return {pygame.K_RIGHT}
+
+
+def run_bot(game, physics, max_ticks):
+    from inputs import ScriptedInput
+
+    game.physics = PhysicsParams(**physics)
+    game.ticks = 0
+    game.input = ScriptedInput()
+    game.new()
+    tick = 0
+    while game.playing and tick < max_ticks:
+        game.input.set_keys(runner_keys(game))
+        game.events()
+        game.update()
+        tick += 1
+    return tick
+
+
+def run(job):
+    # a single run in a worker: physics values, replay file or None for the bot, tick limit
+    global worker_game
+    physics, replay_path, max_ticks = job
+    if worker_game is None:
+        import main
+        worker_game = main.Game(headless=True)
+    game = worker_game
+
+    if replay_path is None:
+        ticks = run_bot(game, physics, max_ticks)
+    else:
+        replay = worker_replays.get(replay_path)
+        if replay is None:
+            replay = worker_replays[replay_path] = read_replay(replay_path)
+        ticks = play(replay, game, physics=physics)['ticks']
+
+    result = dict(physics)
+    result.update({
+        'completed': game.win,
+        # a win leaves level_index one past the last level
+        'level': min(game.level_index, len(game.levels) - 1) + 1,
+        'seconds': round(ticks / TICK_RATE, 2),
+        'score': game.score.score_val,
+        'deaths': 3 - game.lives.lives,
+    })
+    return result
+
+
+def sweep(physics_grid, replay_path=None, max_ticks=MAX_TICKS, workers=None):
+    # fan the runs out over a process pool, results come back in grid order
+    jobs = [(physics, replay_path, max_ticks) for physics in physics_grid]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run, jobs))
+
+
+def format_table(results):
+    widths = {column: max(len(column), *(len(str(result[column])) for result in results)) for column in COLUMNS}
+    lines = ['  '.join(column.rjust(widths[column]) for column in COLUMNS)]
+    for result in results:
+        lines.append('  '.join(str(result[column]).rjust(widths[column]) for column in COLUMNS))
+    return '\n'.join(lines)
+
+
+def write_results(results, file_path):
+    with open(file_path, 'w', newline='') as file:
+        if file_path.endswith('.csv'):
+            writer = csv.DictWriter(file, fieldnames=COLUMNS)
+            writer.writeheader()
+            writer.writerows(results)
+        else:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == '__main__':
+    defaults = PhysicsParams().as_dict()
+    parser = argparse.ArgumentParser(description='Play the game headless over a grid of physics settings.')
+    for name, option in OPTIONS.items():
+        parser.add_argument(option, dest=name, type=float, nargs='+',
+                            help=f"values to try, {defaults[name]} if not given")
+    parser.add_argument('--replay', help='replay to feed every run, the scripted runner if not given')
+    parser.add_argument('--ticks', type=int, default=MAX_TICKS, help='longest run in ticks')
+    parser.add_argument('--workers', type=int, help='processes to use, one per core if not given')
+    parser.add_argument('--output', help='write the table to a .csv or .json file')
+    args = parser.parse_args()
+
+    values = {name: getattr(args, name) or [defaults[name]] for name in PHYSICS}
+    physics_grid = grid(values)
+
+    start = time.perf_counter()
+    results = sweep(physics_grid, args.replay, args.ticks, args.workers)
+    seconds = time.perf_counter() - start
+
+    print(format_table(results))
+    print(f"{len(results)} runs in {seconds:.2f}s, {len(results) / seconds:.1f} runs/s")
+    if args.output:
+        write_results(results, args.output)
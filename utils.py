@@ -2,19 +2,32 @@ import pygame
 import config
 from config import *
 from parents import DisplayText
+from resources import ASSETS, FONTS, TEXT_CACHE
 
 class Camera:
-    def __init__(self, width, height, map_width, map_height):
+    def __init__(self, width, height, map_width, map_height, margin=CULL_MARGIN):
         self.camera = pygame.Rect(0, 0, WIN_WIDTH, WIN_HEIGHT)
         self.width = width
         self.height = height
         self.map_width = map_width
         self.map_height = map_height
 
+        # world space rects, refreshed once per camera move
+        self.margin = margin
+        self.view_rect = pygame.Rect(0, 0, 0, 0)
+        self.world_rect = pygame.Rect(0, 0, 0, 0)
+        self.update_view()
+
+        self.culled = 0
+        self.inactive = 0
+        self.previous = self.camera.topleft
+
     def apply(self, entity):
         return entity.rect.move(self.camera.topleft)
 
     def update(self, target):
+        self.previous = self.camera.topleft
+
         x = -target.rect.centerx + int(self.width / 2)
         y = -target.rect.centery + int(self.height / 2)
 
@@ -24,19 +37,44 @@ class Camera:
         y = min(0, y)  # top
         y = max(-(self.map_height - self.height), y)  # bottom
 
-        self.camera = pygame.Rect(x, y, self.width, self.height)
+        self.camera.x = x
+        self.camera.y = y
+        self.update_view()
+
+    def offset(self, alpha=1):
+        # camera position between the last two updates
+        previous_x, previous_y = self.previous
+        return (previous_x + (self.camera.x - previous_x) * alpha,
+                previous_y + (self.camera.y - previous_y) * alpha)
+
+    def update_view(self):
+        # visible area plus margin, used for draw culling
+        self.view_rect.update(-self.camera.x - self.margin, -self.camera.y - self.margin,
+                              self.width + self.margin * 2, self.height + self.margin * 2)
 
-    def get_world_rect(self):
         # enemy action range
-        return pygame.Rect(-(self.camera.x - 60), self.camera.y, self.width, self.height)
+        self.world_rect.update(-(self.camera.x - 60), self.camera.y, self.width, self.height)
+
+    def visible(self, sprites):
+        view_rect = self.view_rect
+        visible = [sprite for sprite in sprites if view_rect.colliderect(sprite.rect)]
+        self.culled = len(sprites) - len(visible)
+        return visible
+
+    def active(self, enemies):
+        # enemies keep moving once they have been in range
+        world_rect = self.world_rect
+        active = [enemy for enemy in enemies
+                  if enemy.wasOnScreen or world_rect.colliderect(enemy.rect)]
+        self.inactive = len(enemies) - len(active)
+        return active
 
 
 class Button(DisplayText):
     def __init__(self, x, y, width, height, fg, bg, content, fontsize, scale_factor):
         super().__init__(x, y, width, height, fg, content, fontsize, scale_factor, bg=bg)
 
-        self.button_sound = pygame.mixer.Sound(resource_path(SOUND_MENU_SELECT))
-        self.button_sound.set_volume(VOL_SELECT)
+        self.button_sound = ASSETS.sound(SOUND_MENU_SELECT, VOL_SELECT)
 
     def update_position(self, scale_factor):
         super().update_position(scale_factor)
@@ -73,14 +111,18 @@ class Slider():
         self.name = name
 
         self.fontsize = 16
-        self.font = pygame.font.Font(resource_path(MAIN_FONT), self.fontsize)
 
         self.thumb_x = self.initial_x + int(self.value * self.initial_width)
         self.thumb_radius = self.initial_height * 1.2
 
+        self.layout_scale = None
         self.update_position(scale_factor)
 
     def update_position(self, scale_factor):
+        # layout only changes with the scale
+        if scale_factor == self.layout_scale:
+            return
+        self.layout_scale = scale_factor
         self.scale_factor = scale_factor
 
         self.x = int(self.initial_x * scale_factor)
@@ -90,7 +132,7 @@ class Slider():
         self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
 
         self.thumb_x = self.x + int(self.value * self.width)
-        self.font = pygame.font.Font(None, int(self.fontsize * self.scale_factor))
+        self.font = FONTS.get(None, int(self.fontsize * self.scale_factor))
 
         extra_click_height = int(self.height * 2.5)
         offset = (extra_click_height - self.height) // 2
@@ -101,18 +143,20 @@ class Slider():
             extra_click_height
         )
 
-    def draw(self, surface):
-        pygame.draw.rect(surface, self.fg, self.rect)
+    def draw(self, surface, dirty=None):
+        bar = pygame.draw.rect(surface, self.fg, self.rect)
         pygame.draw.rect(surface, self.fg, self.rect, 2)
 
         thumb_center = (self.thumb_x, self.y + self.height // 2)
-        pygame.draw.circle(surface, self.fg, thumb_center, self.thumb_radius)
+        thumb = pygame.draw.circle(surface, self.fg, thumb_center, self.thumb_radius)
 
         actual_value = self.min_value + self.value * (self.max_value - self.min_value)
         label = f"{self.name}: {round(actual_value, 2)}"
         text_surface = self.font.render(label, True, self.fg)
 
-        surface.blit(text_surface, (self.x, self.y - self.fontsize - 5))
+        text = surface.blit(text_surface, (self.x, self.y - self.fontsize - 5))
+        if dirty is not None:
+            dirty.mark(self, bar.union(thumb).union(text), (self.thumb_x, label))
 
     def interact(self, event):
         if event.type == pygame.MOUSEBUTTONDOWN:
@@ -151,28 +195,29 @@ class Timer:
         self.fg = fg # foreground color
         self.init_fontsize = fontsize
 
-        self.font = pygame.font.Font(resource_path(MAIN_FONT), self.init_fontsize)
-
         self.max_time = max_time
 
         self.scale_factor = scale_factor
+        self.layout_scale = None
 
         self.update_position(self.scale_factor)
 
-        self.start_time = pygame.time.get_ticks()
+        self.start_time = self.game.ticks
 
     def get_elapsed_time(self):
-        curr_time = pygame.time.get_ticks()
-        return (curr_time - self.start_time) // 1000
+        curr_time = self.game.ticks
+        return int(curr_time - self.start_time) // 1000
     
-    def draw(self, surface, offset=(0,0)):
+    def draw(self, surface, offset=(0,0), dirty=None):
         elapsed = self.get_elapsed_time()
         time_left = self.max_time - elapsed
-        text = self.font.render(("Timer: " + str(time_left)), True, self.fg)
-        surface.blit(text, (self.x + offset[0], self.y + offset[1]))
+        text = TEXT_CACHE.render(self.font, "Timer: " + str(time_left), self.fg)
+        rect = surface.blit(text, (self.x + offset[0], self.y + offset[1]))
+        if dirty is not None:
+            dirty.mark(self, rect, text)
 
     def reset_time(self):
-        self.start_time = pygame.time.get_ticks()
+        self.start_time = self.game.ticks
 
     def times_up(self):
         elapsed = self.get_elapsed_time()
@@ -182,6 +227,10 @@ class Timer:
         return False
 
     def update_position(self, scale_factor):
+        # layout only changes with the scale
+        if scale_factor == self.layout_scale:
+            return
+        self.layout_scale = scale_factor
         self.scale_factor = scale_factor
 
         self.x = int(self.init_x * self.scale_factor)
@@ -190,7 +239,7 @@ class Timer:
         self.height = int(self.init_height * self.scale_factor)
 
         self.fontsize = int(self.init_fontsize * self.scale_factor)
-        self.font = pygame.font.Font(resource_path(MAIN_FONT), self.fontsize)
+        self.font = FONTS.get(MAIN_FONT, self.fontsize)
 
 
 class Score(DisplayText):
@@ -198,9 +247,11 @@ class Score(DisplayText):
         super().__init__(x, y, width, height, fg, content, fontsize, scale_factor)
         self.score_val = 0
 
-    def draw(self, surface, offset=(0,0)):
-        text = self.font.render(("Score: " + str(self.score_val)), True, self.fg)
-        surface.blit(text, (self.x + offset[0], self.y + offset[1]))
+    def draw(self, surface, offset=(0,0), dirty=None):
+        text = TEXT_CACHE.render(self.font, "Score: " + str(self.score_val), self.fg)
+        rect = surface.blit(text, (self.x + offset[0], self.y + offset[1]))
+        if dirty is not None:
+            dirty.mark(self, rect, text)
 
     def increase_score(self, points):
         self.score_val += points
@@ -215,9 +266,11 @@ class Lives(DisplayText):
         self.game = game
         self.lives = 3
 
-    def draw(self, surface, offset=(0,0)):
-        text = self.font.render(("Lives: " + str(self.lives)), True, self.fg)
-        surface.blit(text, (self.x + offset[0], self.y + offset[1]))
+    def draw(self, surface, offset=(0,0), dirty=None):
+        text = TEXT_CACHE.render(self.font, "Lives: " + str(self.lives), self.fg)
+        rect = surface.blit(text, (self.x + offset[0], self.y + offset[1]))
+        if dirty is not None:
+            dirty.mark(self, rect, text)
 
     def gain_life(self):
         self.lives += 1
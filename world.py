@@ -0,0 +1,106 @@
+import math
+import pygame
+from config import *
+from sprites import Enemy
+from collision import merge_spans
+
+class ChunkStreamer:
+    def __init__(self, game, level):
+        self.game = game
+        self.level = level
+
+        self.chunk_width = CHUNK_WIDTH * TILESIZE
+        self.chunk_height = CHUNK_HEIGHT * TILESIZE
+        self.columns = math.ceil(level.width / CHUNK_WIDTH)
+        self.rows = math.ceil(level.height / CHUNK_HEIGHT)
+
+        # chunk -> collision spans for loaded chunks, enemy states for retired ones
+        self.loaded = {}
+        self.parked = {}
+
+        # enemies are created the first time their chunk loads
+        self.spawns = {}
+        for x, y, char in level.entities:
+            if char == 'E':
+                key = (x // CHUNK_WIDTH, y // CHUNK_HEIGHT)
+                self.spawns.setdefault(key, []).append((x, y))
+
+        self.loads = 0
+        self.retires = 0
+
+    def chunk_keys(self, rect, radius):
+        first_x = max(0, rect.left // self.chunk_width - radius)
+        last_x = min(self.columns - 1, (rect.right - 1) // self.chunk_width + radius)
+        first_y = max(0, rect.top // self.chunk_height - radius)
+        last_y = min(self.rows - 1, (rect.bottom - 1) // self.chunk_height + radius)
+        return {(cx, cy) for cy in range(first_y, last_y + 1) for cx in range(first_x, last_x + 1)}
+
+    def update(self, rect):
+        # load around the area of interest, retire what has fallen well behind it
+        wanted = self.chunk_keys(rect, LOAD_RADIUS)
+        kept = self.chunk_keys(rect, RETIRE_RADIUS)
+
+        for key in wanted:
+            if key not in self.loaded:
+                self.load(key)
+        for key in [key for key in self.loaded if key not in kept]:
+            self.retire(key)
+
+        self.park_strays()
+
+    def load(self, key):
+        game = self.game
+        cx, cy = key
+
+        left = cx * CHUNK_WIDTH
+        top = cy * CHUNK_HEIGHT
+        right = left + CHUNK_WIDTH
+        bottom = top + CHUNK_HEIGHT
+
+        # tiles stay in the level grid, physics collides with merged runs of them
+        spans = []
+        for order, span in merge_spans(self.level, left, top, right, bottom, MERGE_RECTANGLES):
+            game.collision.add(span, order)
+            spans.append(span)
+        self.loaded[key] = spans
+
+        for x, y in self.spawns.pop(key, ()):
+            Enemy(game, x, y)
+        for state in self.parked.pop(key, ()):
+            Enemy(game, 0, 0).set_state(state)
+
+        self.loads += 1
+
+    def retire(self, key):
+        game = self.game
+        for span in self.loaded.pop(key):
+            game.collision.remove(span)
+
+        cx, cy = key
+        area = pygame.Rect(cx * self.chunk_width, cy * self.chunk_height,
+                           self.chunk_width, self.chunk_height)
+        for enemy in game.enemy.sprites():
+            if area.collidepoint(enemy.rect.center):
+                self.park(enemy, key)
+
+        game.tile_layer.unload(key)
+        self.retires += 1
+
+    def park(self, enemy, key):
+        # enemies off the map are gone for good
+        if 0 <= key[0] < self.columns and 0 <= key[1] < self.rows:
+            self.parked.setdefault(key, []).append(enemy.get_state())
+        enemy.kill()
+
+    def park_strays(self):
+        # an enemy walking into an unloaded chunk waits there until it loads
+        batch = self.game.enemy_batch
+        enemies = self.game.enemy.sprites() if batch is None else batch.strays(self)
+        for enemy in enemies:
+            if not enemy.wasOnScreen:
+                continue
+            rect = enemy.rect
+            for key in self.chunk_keys(rect, 0) or [(rect.left // self.chunk_width, rect.top // self.chunk_height)]:
+                if key not in self.loaded:
+                    self.park(enemy, key)
+                    break